@@ -0,0 +1,107 @@
+from expression import compile_ast, normalize_result, parse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Evaluate one expression in a free variable over many input values.
+# With NumPy the whole array goes through a single vectorized pass; without it
+# (or for functions NumPy has no ufunc for) a compiled closure is looped over.
+
+EXACT_LIMIT = 2.0 ** 53
+
+if np is not None:
+    _NP_COMMON = {
+        'sqrt': np.sqrt,
+        'log': np.log,
+        'ln': np.log,
+        'log10': np.log10,
+        'abs': np.abs,
+    }
+    NP_RAD_FUNCS = dict(_NP_COMMON, sin=np.sin, cos=np.cos, tan=np.tan,
+                        asin=np.arcsin, acos=np.arccos, atan=np.arctan)
+    NP_DEG_FUNCS = dict(_NP_COMMON,
+                        sin=lambda v: np.sin(np.radians(v)),
+                        cos=lambda v: np.cos(np.radians(v)),
+                        tan=lambda v: np.tan(np.radians(v)),
+                        asin=lambda v: np.degrees(np.arcsin(v)),
+                        acos=lambda v: np.degrees(np.arccos(v)),
+                        atan=lambda v: np.degrees(np.arctan(v)))
+
+
+def _calls(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        kind = node[0]
+        if kind == 'call':
+            yield node[1]
+            stack.append(node[2])
+        elif kind in ('neg', 'pos'):
+            stack.append(node[1])
+        elif kind == 'bin':
+            stack.append(node[2])
+            stack.append(node[3])
+
+
+def _scalar(fn, value, normalize):
+    try:
+        result = fn(value)
+    except (ArithmeticError, ValueError, TypeError):
+        return None
+    return normalize_result(result) if normalize else result
+
+
+def _vectorizable(node):
+    return np is not None and all(name in NP_RAD_FUNCS for name in _calls(node))
+
+
+def _exact_inputs(source):
+    # Integers float64 can't hold exactly: x % 7 of such an x could be off
+    # even though the result itself is small, so nothing is recomputed for it
+    if isinstance(source, np.ndarray):
+        if source.dtype.kind not in 'iu' or not source.size:
+            return False
+        # min and max rather than abs(), which overflows for the lowest int64
+        return max(int(source.max()), -int(source.min())) >= EXACT_LIMIT
+    return any(isinstance(v, (int, np.integer)) and abs(int(v)) >= EXACT_LIMIT
+               for v in source)
+
+
+def evaluate_many(expression, values, is_degree=True, variable='x', normalize=True):
+    # Returns a list with one result per value; inputs that fail to evaluate
+    # (domain errors, division by zero...) give None, just like the scalar path
+    node = parse(expression)
+    fn = compile_ast(node, is_degree, variable)
+
+    if not _vectorizable(node):
+        return [_scalar(fn, v, normalize) for v in values]
+
+    if isinstance(values, np.ndarray):
+        source = values.ravel()
+    else:
+        source = values if hasattr(values, '__len__') else list(values)
+    if _exact_inputs(source):
+        if isinstance(source, np.ndarray):
+            source = source.tolist()
+        return [_scalar(fn, v, normalize) for v in source]
+    arr = np.asarray(source, dtype=np.float64)
+    funcs = NP_DEG_FUNCS if is_degree else NP_RAD_FUNCS
+    with np.errstate(all='ignore'):
+        out = compile_ast(node, is_degree, variable, funcs=funcs)(arr)
+    out = np.broadcast_to(np.asarray(out, dtype=np.float64), arr.shape)
+
+    # NumPy reports errors as inf/nan and loses integer exactness past 2**53;
+    # those elements are recomputed with Python numbers to keep results identical
+    redo = ~np.isfinite(out) | (np.abs(out) >= EXACT_LIMIT)
+    results = out.tolist()
+    if normalize:
+        results = [normalize_result(r) for r in results]
+    if redo.any():
+        if isinstance(source, np.ndarray):
+            source = source.tolist()
+        for i in np.flatnonzero(redo).tolist():
+            results[i] = _scalar(fn, source[i], normalize)
+    return results
+
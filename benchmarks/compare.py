@@ -0,0 +1,65 @@
+import argparse
+import json
+import sys
+
+# Compare two benchmark result files from run.py:
+#   python benchmarks/compare.py baseline.json current.json [--threshold 10]
+# A benchmark whose median time per operation grew by more than the threshold
+# (percent) is a regression, and the exit status is 1 if there are any.
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return {name: result for name, result in data.get('results', {}).items()
+            if 'median' in result}
+
+
+def compare(baseline, current, threshold=10.0):
+    # [(name, baseline median, current median, change in percent, verdict)]
+    rows = []
+    for name in sorted(baseline.keys() | current.keys()):
+        if name not in current:
+            rows.append((name, baseline[name]['median'], None, None, 'removed'))
+            continue
+        if name not in baseline:
+            rows.append((name, None, current[name]['median'], None, 'new'))
+            continue
+        before, after = baseline[name]['median'], current[name]['median']
+        change = (after - before) / before * 100 if before > 0 else 0.0
+        if change > threshold:
+            verdict = 'REGRESSION'
+        elif change < -threshold:
+            verdict = 'faster'
+        else:
+            verdict = ''
+        rows.append((name, before, after, change, verdict))
+    return rows
+
+
+def _us(seconds):
+    return '-' if seconds is None else f"{seconds * 1e6:.2f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="percent slowdown that counts as a regression (default: 10)")
+    args = parser.parse_args(argv)
+
+    rows = compare(load(args.baseline), load(args.current), args.threshold)
+    print(f"{'benchmark':<36} {'before us':>12} {'after us':>12} {'change':>9}")
+    for name, before, after, change, verdict in rows:
+        change_text = '' if change is None else f"{change:+.1f}%"
+        print(f"{name:<36} {_us(before):>12} {_us(after):>12} {change_text:>9}  {verdict}")
+    regressions = [row[0] for row in rows if row[4] == 'REGRESSION']
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:g}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
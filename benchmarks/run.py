@@ -0,0 +1,374 @@
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from calculator_core import CalculatorCore, calculate_text
+from expression import ExpressionCache
+
+# Benchmarks for the calculator's hot paths. Results are written as JSON, to
+# be compared between runs with compare.py:
+#   python benchmarks/run.py [-o results.json] [--filter engine] [--quick]
+# GUI benchmarks need a display (e.g. xvfb-run python benchmarks/run.py) and
+# are recorded as skipped without one.
+#
+# Every benchmark is a function taking a loop count and returning the seconds
+# those loops took, so setup can be kept out of the measurement.
+
+BENCHMARKS = {}  # name -> (function, operations per loop, needs display)
+
+STANDARD = ['12+7*3', '(45-3)/7', '2.5*4-1', '100/8+3*(2-5)', '7%3+0.5',
+            '((1+2)*(3+4))/5', '123456789*987654321', '1/3+1/6']
+SCIENTIFIC = ['sin(30)+cos(60)', 'tan(45)*2', 'sqrt(2)**2', 'log10(1000)+log(10)',
+              'factorial(12)/factorial(10)', 'asin(0.5)+acos(0.5)', 'abs(-3.7)*2**8',
+              'atan(1)*4']
+CONVERSIONS = [('kilometer', 'mile', 'length'), ('inch', 'centimeter', 'length'),
+               ('pound', 'kilogram', 'weight'), ('celsius', 'fahrenheit', 'temperature'),
+               ('gibibyte', 'megabyte', 'data')]
+
+
+def benchmark(name, ops=1, display=False):
+    def register(function):
+        BENCHMARKS[name] = (function, ops, display)
+        return function
+    return register
+
+
+#  ENGINE
+def _engine(corpus, is_degree, cache_size, backend='float'):
+    def run(loops):
+        cache = ExpressionCache(cache_size)
+        for expr in corpus:  # warm the cache, if there is one
+            calculate_text(cache, expr, is_degree, backend)
+        start = time.perf_counter()
+        for _ in range(loops):
+            for expr in corpus:
+                calculate_text(cache, expr, is_degree, backend)
+        return time.perf_counter() - start
+    return run
+
+
+for _corpus_name, _corpus in (('standard', STANDARD), ('scientific', SCIENTIFIC)):
+    for _mode, _is_degree in (('deg', True), ('rad', False)):
+        benchmark(f'engine.{_corpus_name}.{_mode}.cached', len(_corpus))(
+            _engine(_corpus, _is_degree, 256))
+        benchmark(f'engine.{_corpus_name}.{_mode}.uncached', len(_corpus))(
+            _engine(_corpus, _is_degree, 0))
+benchmark('engine.scientific.deg.decimal', len(SCIENTIFIC))(_engine(SCIENTIFIC, True, 256, 'decimal'))
+benchmark('engine.standard.deg.fraction', len(STANDARD))(_engine(STANDARD, True, 256, 'fraction'))
+
+
+@benchmark('core.calculate', len(STANDARD) + len(SCIENTIFIC))
+def bench_core_calculate(loops):
+    # The keypad's "=" path, including formatting and history
+    core = CalculatorCore()
+    corpus = STANDARD + SCIENTIFIC
+    start = time.perf_counter()
+    for _ in range(loops):
+        for expr in corpus:
+            core.expression = expr
+            core.calculate()
+    return time.perf_counter() - start
+
+
+#  CONVERTER
+@benchmark('converter.convert_units', len(CONVERSIONS))
+def bench_convert_units(loops):
+    core = CalculatorCore()
+    start = time.perf_counter()
+    for _ in range(loops):
+        for from_u, to_u, dimension in CONVERSIONS:
+            core.convert_units("42.5", from_u, to_u, dimension)
+    return time.perf_counter() - start
+
+
+@benchmark('converter.convert_many', 10000)
+def bench_convert_many(loops):
+    core = CalculatorCore()
+    values = [float(i) for i in range(10000)]
+    start = time.perf_counter()
+    for _ in range(loops):
+        core.units.convert_many(values, 'celsius', 'fahrenheit', 'temperature')
+    return time.perf_counter() - start
+
+
+#  GAME
+@benchmark('game.generate_question')
+def bench_generate_question(loops):
+    core = CalculatorCore()
+    core.new_game(seed=1234)
+    start = time.perf_counter()
+    for _ in range(loops):
+        core.generate_question()
+    return time.perf_counter() - start
+
+
+@benchmark('game.check_answer')
+def bench_check_answer(loops):
+    core = CalculatorCore()
+    core.new_game(seed=1234)
+    core.generate_question()
+    answer = str(core.game_answer)
+    start = time.perf_counter()
+    for _ in range(loops):
+        core.check_answer(answer)
+    return time.perf_counter() - start
+
+
+#  SYMBOLIC
+FORMULA = [f'{i}*sin({i}*x)+x**{i % 5 + 2}/({i}+x)' for i in range(1, 101)]
+
+
+@benchmark('symbolic.derivative')
+def bench_symbolic_derivative(loops):
+    core = CalculatorCore()
+    text = '+'.join(FORMULA[:20])
+    start = time.perf_counter()
+    for _ in range(loops):
+        core.differentiate(text)
+    return time.perf_counter() - start
+
+
+@benchmark('symbolic.edit_one_term')
+def bench_symbolic_edit(loops):
+    # Re-evaluating a 100-term formula after changing one term
+    core = CalculatorCore()
+    edits = ['+'.join(FORMULA[:50] + [f'cos({i}*x)'] + FORMULA[51:]) for i in range(2)]
+    core.evaluate_symbolic(edits[1], {'x': 0.5})
+    start = time.perf_counter()
+    for i in range(loops):
+        core.evaluate_symbolic(edits[i % 2], {'x': 0.5})
+    return time.perf_counter() - start
+
+
+#  PLOT
+@benchmark('plot.sample')
+def bench_plot_sample(loops):
+    # Adaptive sampling of a function with poles and fast oscillation
+    core = CalculatorCore()
+    start = time.perf_counter()
+    for _ in range(loops):
+        core.plot('tan(x)+sin(50*x)', -360, 360).run()
+    return time.perf_counter() - start
+
+
+@benchmark('plot.downsample_1m')
+def bench_plot_downsample(loops):
+    # One frame's worth of a million samples reduced to an 800px wide view
+    from plotting import downsample
+    xs = [i / 1000 for i in range(1000000)]
+    ys = [math.sin(x) for x in xs]
+    view = (0.0, 1000.0, -1.0, 1.0)
+    start = time.perf_counter()
+    for _ in range(loops):
+        downsample(xs, ys, view, 800, 400)
+    return time.perf_counter() - start
+
+
+#  SESSION
+@benchmark('session.restore')
+def bench_session_restore(loops):
+    # Startup's share of a long-used session: 100 registers, rewritten many
+    # times over, loaded and applied to a fresh core
+    import tempfile
+    from session_store import SessionStore
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'session.bin')
+        store, core = SessionStore(path), CalculatorCore()
+        store.load()
+        for i in range(20000):
+            core.registers[f'R{i % 100}'] = i / 7
+            core.expression = f'{i}+{i}'
+            store.replace(core.snapshot())
+        store.close()
+        start = time.perf_counter()
+        for _ in range(loops):
+            CalculatorCore().restore(SessionStore(path).load())
+        return time.perf_counter() - start
+
+
+#  GUI
+# Each operation is followed by update_idletasks(), so the geometry and
+# redraw work Tk defers to idle time is part of the measurement.
+_gui = {}
+
+
+def _calculator():
+    import tkinter as tk
+    from guarded import GuardedEvaluator
+    from sunset_beach import UltraCalculator
+    if 'root' not in _gui:
+        _gui['evaluator'] = GuardedEvaluator()
+        _gui['root'] = tk.Tk()
+        _gui['app'] = UltraCalculator(_gui['root'], evaluator=_gui['evaluator'])
+    return _gui['root'], _gui['app']
+
+
+@benchmark('gui.create_widgets', display=True)
+def bench_create_widgets(loops):
+    import tkinter as tk
+    from sunset_beach import UltraCalculator
+    _calculator()
+    elapsed = 0.0
+    for _ in range(loops):
+        root = tk.Tk()
+        start = time.perf_counter()
+        UltraCalculator(root, evaluator=_gui['evaluator'])
+        root.update_idletasks()
+        elapsed += time.perf_counter() - start
+        root.destroy()
+    return elapsed
+
+
+@benchmark('gui.switch_mode', 3, display=True)
+def bench_switch_mode(loops):
+    root, app = _calculator()
+    start = time.perf_counter()
+    for _ in range(loops):
+        for mode in ('converter', 'game', 'calculator'):
+            app.switch_mode(mode)
+            root.update_idletasks()
+    return time.perf_counter() - start
+
+
+@benchmark('gui.toggle_scientific', display=True)
+def bench_toggle_scientific(loops):
+    root, app = _calculator()
+    app.switch_mode('calculator')
+    start = time.perf_counter()
+    for _ in range(loops):
+        app.toggle_scientific()
+        root.update_idletasks()
+    return time.perf_counter() - start
+
+
+@benchmark('gui.cycle_theme', display=True)
+def bench_cycle_theme(loops):
+    root, app = _calculator()
+    start = time.perf_counter()
+    for _ in range(loops):
+        app.cycle_theme()
+        root.update_idletasks()
+    return time.perf_counter() - start
+
+
+def measure(function, ops, repeat=7, min_time=0.05):
+    # Calibrate the loop count so one sample takes at least min_time, then
+    # take `repeat` samples; times are per operation
+    loops = 1
+    while True:
+        elapsed = function(loops)
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed * 1.2) + 1))
+    samples = [function(loops) / (loops * ops) for _ in range(repeat)]
+    median = statistics.median(samples)
+    return {
+        'median': median,
+        'min': min(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'ops_per_sec': 1 / median if median > 0 else None,
+        'loops': loops,
+        'ops_per_loop': ops,
+        'repeat': repeat,
+    }
+
+
+def _metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'timestamp': time.time(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': numpy_version,
+        'display': os.environ.get('DISPLAY'),
+    }
+
+
+def _has_display():
+    if not os.environ.get('DISPLAY') and sys.platform not in ('win32', 'darwin'):
+        return False
+    try:
+        _calculator()
+    except Exception:
+        return False
+    return True
+
+
+def run(names, repeat=7, min_time=0.05, out=sys.stdout):
+    results = {}
+    display = None
+    for name in names:
+        function, ops, needs_display = BENCHMARKS[name]
+        if needs_display:
+            if display is None:
+                display = _has_display()
+            if not display:
+                results[name] = {'skipped': "no display"}
+                out.write(f"{name:<36} skipped (no display)\n")
+                continue
+        result = results[name] = measure(function, ops, repeat, min_time)
+        out.write(f"{name:<36} {result['median'] * 1e6:12.2f} us/op  "
+                  f"({result['ops_per_sec']:,.0f} ops/s)\n")
+        out.flush()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the calculator benchmarks")
+    parser.add_argument('-o', '--output', help="JSON file to write "
+                        "(default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--filter', action='append', default=[],
+                        help="only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument('--repeat', type=int, default=7, help="samples per benchmark (default: 7)")
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help="minimum seconds per sample (default: 0.05)")
+    parser.add_argument('--quick', action='store_true', help="3 short samples per benchmark")
+    parser.add_argument('--list', action='store_true', help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS
+             if not args.filter or any(f in name for f in args.filter)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    if args.quick:
+        args.repeat, args.min_time = 3, 0.01
+
+    results = run(names, max(args.repeat, 1), args.min_time)
+    path = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', time.strftime('%Y%m%d-%H%M%S') + '.json')
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': _metadata(), 'results': results}, f, indent=2)
+    print(f"Results written to {path}")
+    if 'evaluator' in _gui:
+        _gui['evaluator'].close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from parallel import scaling_report
+
+# Throughput of parallel.py's executor per worker count:
+#   python benchmarks/scaling.py [FILE] [--workers 1,2,4,8] [--count N] [--unordered]
+# FILE has one expression per line (an audit tape, a calc_cli input); without
+# one a synthetic tape of standard and scientific expressions is used. The
+# first row, 0 workers, is the plain single-process loop the speedups are
+# relative to.
+
+
+def synthetic(count):
+    # Mostly distinct expressions, with some repeats, like a real tape
+    forms = ['{a}+{b}*3', '({a}-3)/{b}', 'sin({a})+cos({b})', 'sqrt({a})**2+{b}',
+             'log10({a})*{b}', 'factorial({c})/{b}', '{a}**2-{b}**2', 'atan({a})*4']
+    return [forms[i % len(forms)].format(a=i % 1000 + 1, b=i % 37 + 1, c=i % 20)
+            for i in range(count)]
+
+
+def default_workers():
+    counts, n = [0, 1], 2
+    while n <= (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure parallel evaluation throughput")
+    parser.add_argument('file', nargs='?', help="expressions, one per line")
+    parser.add_argument('--workers', help="comma-separated worker counts "
+                        "(default: 0, 1, 2, 4, ... up to the number of CPUs)")
+    parser.add_argument('--count', type=int, default=200000,
+                        help="expressions in the synthetic tape (default: 200000)")
+    parser.add_argument('--unordered', action='store_true',
+                        help="take results as chunks finish instead of in input order")
+    parser.add_argument('--rad', action='store_true', help="use radians (default: degrees)")
+    args = parser.parse_args(argv)
+
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            expressions = [line for line in f if line.strip()]
+    else:
+        expressions = synthetic(args.count)
+    workers = ([int(n) for n in args.workers.split(',')] if args.workers
+               else default_workers())
+
+    print(f"{len(expressions)} expressions, {os.cpu_count()} CPUs, "
+          f"{'unordered' if args.unordered else 'ordered'}")
+    print(f"{'workers':>8} {'seconds':>9} {'expr/s':>11} {'speedup':>8}")
+    for count, seconds, rate, speedup in scaling_report(
+            expressions, workers, not args.unordered, is_degree=not args.rad):
+        print(f"{count:>8} {seconds:>9.3f} {rate:>11.0f} {speedup:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
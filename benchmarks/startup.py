@@ -0,0 +1,98 @@
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from session_store import SessionStore
+
+# Cold-launch time and memory of the GUI:
+#   xvfb-run python benchmarks/startup.py [--runs 10]
+# Each launch is a new interpreter (sunset_beach.py --startup-probe) timed
+# from process start until its first frame is on screen, once with no saved
+# session and once with one left in the game and the scientific keypad, with
+# and without --fast-start. Launching needs a display; without one only the
+# import of sunset_beach.py is measured.
+
+IMPORT = ("import resource, sys, time\n"
+          "start = time.perf_counter()\n"
+          "import sunset_beach\n"
+          "print((time.perf_counter() - start) * 1000, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n")
+
+SAVED = {'mode': 'game', 'scientific': True, 'theme': 'neon', 'expression': '12*7',
+         'display': '12*7', 'memory.M': 3.5, 'game.tier': 'hard', 'game.score': 30}
+
+
+def _home(saved):
+    # A fresh home directory, so every launch is a first one for the
+    # calculator's data files
+    home = tempfile.mkdtemp(prefix='calc-startup-')
+    if saved:
+        store = SessionStore(os.path.join(home, '.useless_calculator', 'session.bin'))
+        store.replace(SAVED)
+        store.close()
+    return home
+
+
+def launch(saved, fast):
+    # (milliseconds to the first frame, max RSS in KiB), None if it failed
+    home = _home(saved)
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    command = [sys.executable, os.path.join(ROOT, 'sunset_beach.py'), '--startup-probe']
+    if fast:
+        command.append('--fast-start')
+    try:
+        start = time.perf_counter()
+        done = subprocess.run(command, env=env, capture_output=True, text=True, timeout=60)
+        elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    if done.returncode != 0:
+        return None
+    return elapsed, int(done.stdout.split()[-1])
+
+
+def import_only():
+    done = subprocess.run([sys.executable, '-c', IMPORT], cwd=ROOT, capture_output=True,
+                          text=True, check=True)
+    ms, rss = done.stdout.split()
+    return float(ms), int(rss)
+
+
+def _row(name, samples, out):
+    times = [t for t, _ in samples]
+    rss = max(r for _, r in samples)
+    out.write(f"{name:<28} {statistics.median(times):>9.1f} {min(times):>9.1f} "
+              f"{rss / 1024:>9.1f}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure GUI startup time and memory")
+    parser.add_argument('--runs', type=int, default=10, help="launches per case (default: 10)")
+    args = parser.parse_args(argv)
+    out = sys.stdout
+
+    out.write(f"{'case':<28} {'median ms':>9} {'min ms':>9} {'RSS MiB':>9}\n")
+    _row('import sunset_beach', [import_only() for _ in range(args.runs)], out)
+    for saved in (False, True):
+        for fast in (False, True):
+            name = f"{'saved' if saved else 'fresh'} session{' --fast-start' if fast else ''}"
+            samples = []
+            for _ in range(args.runs):
+                sample = launch(saved, fast)
+                if sample is None:
+                    out.write(f"{name:<28} skipped (no display: try xvfb-run)\n")
+                    return 0
+                samples.append(sample)
+            _row(name, samples, out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import argparse
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from calculator_core import evaluate_text, process_cache
+from expression import BACKENDS
+
+# Streaming evaluation of expression logs without a display:
+#   python sunset_beach.py --eval [FILE ...] [--rad] [--mode M] [--jobs N]
+# Every input line produces exactly one output line, in input order.
+
+
+def evaluate_line(line, is_degree=True, cache=None, backend='float', precision=28):
+    expr = line.strip()
+    if not expr:
+        return ""
+    ok, text = evaluate_text(expr, is_degree, backend, precision, cache)
+    return text if ok else f"Error: {text}"
+
+
+def evaluate_chunk(lines, is_degree=True, backend='float', precision=28):
+    cache = process_cache()
+    return [evaluate_line(line, is_degree, cache, backend, precision) for line in lines]
+
+
+def _read_lines(paths):
+    if not paths:
+        yield from sys.stdin
+        return
+    for path in paths:
+        if path == '-':
+            yield from sys.stdin
+            continue
+        with open(path, encoding='utf-8') as f:
+            yield from f
+
+
+def _chunks(lines, size):
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(lines, out, is_degree=True, jobs=1, chunk_size=1000, backend='float', precision=28):
+    if jobs <= 1:
+        cache = process_cache()
+        for line in lines:
+            out.write(evaluate_line(line, is_degree, cache, backend, precision) + "\n")
+        return
+
+    # Only a bounded window of chunks is in flight, so memory stays flat no
+    # matter how long the input is, and results are written back in order
+    window = deque()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for chunk in _chunks(lines, chunk_size):
+            window.append(pool.submit(evaluate_chunk, chunk, is_degree, backend, precision))
+            if len(window) >= jobs * 4:
+                out.write("\n".join(window.popleft().result()) + "\n")
+        while window:
+            out.write("\n".join(window.popleft().result()) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sunset_beach.py",
+                                     description="Evaluate calculator expressions line by line")
+    parser.add_argument('--eval', action='store_true', required=True,
+                        help="read expressions from files or stdin instead of opening the GUI")
+    parser.add_argument('files', nargs='*', help="input files ('-' or nothing for stdin)")
+    parser.add_argument('--rad', action='store_true', help="use radians (default: degrees)")
+    parser.add_argument('--mode', choices=BACKENDS, default='float',
+                        help="number type: float (default), decimal or exact fraction")
+    parser.add_argument('--precision', type=int, default=28,
+                        help="significant digits for --mode decimal (default: 28)")
+    parser.add_argument('--jobs', type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                        help="lines per work unit with --jobs (default: 1000)")
+    args = parser.parse_args(argv)
+
+    try:
+        run(_read_lines(args.files), sys.stdout, not args.rad,
+            max(args.jobs, 1), max(args.chunk_size, 1), args.mode, max(args.precision, 1))
+    except BrokenPipeError:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
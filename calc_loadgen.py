@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+# Load generator for calc_server.py: N concurrent clients, each keeping up to
+# --pipeline requests in flight, then a throughput and latency report.
+#   python calc_loadgen.py --clients 200 --requests 500 [--socket PATH | --port N]
+
+EXPRESSIONS = [
+    '1+2*3', '(4+5)*6/7', 'sin(30)+cos(60)', 'sqrt(2)**2', 'log10(1000)',
+    'factorial(20)/factorial(18)', '2**10-1', 'tan(45)*3.5', '17%5', 'abs(-3.25)*4',
+    'asin(0.5)', 'log(2.718281828)', '1/0', '((1+2)*(3+4))**2', '12.5*8-3',
+]
+
+
+async def _client(open_connection, count, pipeline, rng, latencies, errors):
+    reader, writer = await open_connection()
+    slots = asyncio.Semaphore(pipeline)
+    sent = {}
+
+    async def send():
+        for i in range(count):
+            await slots.acquire()
+            sent[i] = time.perf_counter()
+            writer.write(json.dumps({'id': i, 'expr': rng.choice(EXPRESSIONS)}).encode() + b"\n")
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    for _ in range(count):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        response = json.loads(line)
+        latencies.append(time.perf_counter() - sent.pop(response['id']))
+        if 'error' in response and response['error'] != "Cannot divide by zero":
+            errors.append(response['error'])
+        slots.release()
+    await sender
+    writer.close()
+    await writer.wait_closed()
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(clients=100, requests=200, pipeline=16, path=None, host='127.0.0.1',
+              port=7333, seed=0):
+    if path is not None:
+        open_connection = lambda: asyncio.open_unix_connection(path)
+    else:
+        open_connection = lambda: asyncio.open_connection(host, port)
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(open_connection, requests, pipeline, random.Random(seed + i), latencies, errors)
+        for i in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(latencies) / elapsed, 1),
+        'latency_ms': {name: round(percentile(latencies, q) * 1000, 3)
+                       for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the calculator service")
+    parser.add_argument('--socket', help="connect to this Unix socket instead of TCP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7333)
+    parser.add_argument('--clients', type=int, default=100, help="concurrent connections")
+    parser.add_argument('--requests', type=int, default=200, help="requests per client")
+    parser.add_argument('--pipeline', type=int, default=16,
+                        help="requests in flight per client (default: 16)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.clients, args.requests, max(args.pipeline, 1),
+                             args.socket, args.host, args.port, args.seed))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        lat = report['latency_ms']
+        print(f"{report['requests']} requests from {report['clients']} clients "
+              f"in {report['seconds']}s: {report['throughput']} req/s, {report['errors']} errors")
+        print(f"latency ms: p50 {lat['p50']}  p90 {lat['p90']}  p99 {lat['p99']}  max {lat['max']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
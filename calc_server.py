@@ -0,0 +1,201 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from calculator_core import evaluate_text
+from expression import BACKENDS
+
+# Calculator service for other processes on the same host:
+#   python sunset_beach.py --serve [--socket PATH | --port N] [--jobs N]
+#
+# Newline-delimited JSON. Each request line is an object
+#   {"id": 1, "expr": "sin(30)", "rad": false, "mode": "float", "precision": 28}
+# where everything but "expr" is optional, and gets one response line
+#   {"id": 1, "result": "0.5"}   or   {"id": 1, "error": "Invalid expression"}
+# Clients may pipeline: responses come back in request order per connection.
+#
+# Requests from all connections are batched per event loop pass and evaluated
+# in a process pool. Each connection has at most `window` requests in flight;
+# past that the server stops reading from it, and it stops evaluating for a
+# client that doesn't read its responses (writer.drain), so one slow or
+# greedy client can't make the server queue unbounded work.
+
+
+def evaluate_batch(batch):
+    # request: (expr, is_degree, backend, precision)
+    return [evaluate_text(*request) for request in batch]
+
+
+def parse_request(line):
+    # (id, (expr, is_degree, backend, precision)) or (id, error message)
+    try:
+        request = json.loads(line)
+        expr = request['expr']
+    except (ValueError, TypeError, KeyError):
+        return None, "Bad request"
+    if not isinstance(expr, str):
+        return None, "Bad request"
+    rid = request.get('id')
+    backend = request.get('mode', 'float')
+    precision = request.get('precision', 28)
+    if backend not in BACKENDS:
+        return rid, f"Unknown mode {backend!r}"
+    if not isinstance(precision, int) or not 1 <= precision <= 1000:
+        return rid, "Bad precision"
+    return rid, (expr, not request.get('rad', False), backend, precision)
+
+
+class Batcher:
+    # Collects requests until the event loop has nothing else ready to run,
+    # then sends them to the pool as one work item
+    def __init__(self, pool, batch_size=256):
+        self.pool = pool
+        self.batch_size = batch_size
+        self._batch = []
+        self._futures = []
+
+    def submit(self, request):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._batch:
+            loop.call_soon(self.flush)
+        self._batch.append(request)
+        self._futures.append(future)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+        return future
+
+    def flush(self):
+        if not self._batch:
+            return
+        batch, futures = self._batch, self._futures
+        self._batch, self._futures = [], []
+        done = asyncio.wrap_future(self.pool.submit(evaluate_batch, batch))
+        done.add_done_callback(lambda f: self._resolve(f, futures))
+
+    @staticmethod
+    def _resolve(done, futures):
+        if done.cancelled() or done.exception() is not None:
+            results = [(False, "Server error")] * len(futures)
+        else:
+            results = done.result()
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class CalculatorServer:
+    def __init__(self, jobs=None, window=256, batch_size=256):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.window = window
+        self.batch_size = batch_size
+        self.pool = None
+        self.batcher = None
+        self.server = None
+
+    async def start(self, path=None, host='127.0.0.1', port=7333):
+        # Spawned, not forked: a forked worker would inherit the open client
+        # sockets and keep connections alive after the server closed them
+        self.pool = ProcessPoolExecutor(max_workers=self.jobs,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        self.batcher = Batcher(self.pool, self.batch_size)
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def handle(self, reader, writer):
+        pending = asyncio.Queue(self.window)
+        responder = asyncio.create_task(self._respond(pending, writer))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break  # line too long, or the client went away
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                rid, request = parse_request(line)
+                if isinstance(request, str):
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result((False, request))
+                else:
+                    future = self.batcher.submit(request)
+                await pending.put((rid, future))
+        finally:
+            await pending.put(None)
+            await responder
+            writer.close()
+
+    async def _respond(self, pending, writer):
+        # Keeps draining the queue after the client has gone, so the reader
+        # side never blocks on a full window
+        connected = True
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            rid, future = item
+            ok, value = await future
+            if not connected:
+                continue
+            response = {'id': rid, 'result' if ok else 'error': value}
+            try:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                connected = False
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+
+async def _serve(args):
+    server = CalculatorServer(args.jobs, args.window)
+    listener = await server.start(args.socket, args.host, args.port)
+    where = args.socket or "%s:%d" % listener.sockets[0].getsockname()[:2]
+    print(f"Calculator service on {where} ({server.jobs} workers)", file=sys.stderr)
+    try:
+        await server.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sunset_beach.py",
+                                     description="Serve calculator evaluation over a local socket")
+    parser.add_argument('--serve', action='store_true', required=True,
+                        help="run the evaluation service instead of opening the GUI")
+    parser.add_argument('--socket', help="listen on this Unix socket path instead of TCP")
+    parser.add_argument('--host', default='127.0.0.1', help="TCP address (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=7333, help="TCP port (default: 7333)")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument('--window', type=int, default=256,
+                        help="requests in flight per connection (default: 256)")
+    args = parser.parse_args(argv)
+    args.window = max(args.window, 1)
+
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
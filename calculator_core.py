@@ -0,0 +1,442 @@
+import math
+import re
+from decimal import Decimal, Overflow, localcontext
+from fractions import Fraction
+
+import decimal_math
+from expression import (BACKENDS, MAX_RESULT_BITS, ExpressionCache, ExpressionError, balance_parens,
+                        format_result)
+from history import HistoryStore
+
+# Headless calculator state machine. The Tk front-end in sunset_beach.py drives
+# an instance of CalculatorCore and only mirrors its state into widgets, so
+# this module must never import tkinter.
+#
+# The game, the unit tables and the symbolic engine are only imported and
+# built on first use, so a calculator that is only used as a calculator
+# starts without them.
+
+
+class CalculationError(Exception):
+    pass
+
+
+def calculate_text(cache, expression, is_degree=True, backend='float', precision=28):
+    # What pressing "=" does to an expression: returns (closed expression, result)
+    expression = balance_parens(expression)
+    try:
+        return expression, cache.evaluate(expression, is_degree, backend, precision)
+    except ZeroDivisionError:
+        raise CalculationError("Cannot divide by zero")
+    except OverflowError:
+        raise CalculationError("Result too large")
+    except Exception:
+        raise CalculationError("Invalid expression")
+
+
+_process_cache = None
+
+
+def process_cache(maxsize=4096, max_bits=MAX_RESULT_BITS):
+    # The compiled-expression cache of a process that evaluates without a
+    # CalculatorCore: the CLI, the service's pool workers and the worker
+    # processes of guarded.py and parallel.py. Made by the first call.
+    global _process_cache
+    if _process_cache is None:
+        _process_cache = ExpressionCache(maxsize, max_bits)
+    return _process_cache
+
+
+def evaluate_text(expression, is_degree=True, backend='float', precision=28, cache=None):
+    # An expression's result as "=" shows it: (True, result text) or
+    # (False, error message)
+    if cache is None:
+        cache = process_cache()
+    try:
+        result = calculate_text(cache, expression, is_degree, backend, precision)[1]
+    except CalculationError as e:
+        return False, str(e)
+    return True, format_result(result, precision)
+
+
+def run_symbolic(action):
+    # Symbolic counterpart of calculate_text's error handling. Parse and
+    # differentiation errors keep their message ("Unknown name 'y'", ...).
+    try:
+        return action()
+    except ZeroDivisionError:
+        raise CalculationError("Cannot divide by zero")
+    except (OverflowError, Overflow):
+        raise CalculationError("Result too large")
+    except ExpressionError as e:
+        raise CalculationError(str(e))
+    except Exception:
+        raise CalculationError("Invalid expression")
+
+
+FUNCTION_KEYS = {
+    'sin': 'sin(', 'cos': 'cos(', 'tan': 'tan(',
+    'asin': 'asin(', 'acos': 'acos(', 'atan': 'atan(',
+    'log': 'log10(', 'ln': 'log(', 'abs': 'abs(',
+    '√': 'sqrt(', 'n!': 'factorial(',
+    'x²': '**2', 'x^y': '**', 'mod': '%',
+    '÷': '/', '×': '*', '%': '/100',
+    'π': str(math.pi), 'e': str(math.e),
+}
+
+# Pasted text: keypad symbols become what the parser understands, then
+# anything it can't use is dropped. Both steps are single linear passes.
+PASTE_TABLE = str.maketrans({
+    '×': '*', '÷': '/', '−': '-', '–': '-', '^': '**', '²': '**2',
+    '√': 'sqrt(', 'π': str(math.pi), '\t': ' ', '\r': None,
+})
+_PASTE_JUNK = re.compile(r'[^0-9A-Za-z_.+\-*/%() \n]+')
+
+
+MEMORY_PREFIX = 'memory.'  # snapshot key prefix of the memory registers
+GAME_KEYS = ('game.tier', 'game.score')
+
+
+def split_input(text):
+    # Cleaned lines of pasted text; the last one is what follows the final
+    # newline (often "")
+    return [line.strip() for line in _PASTE_JUNK.sub('', text.translate(PASTE_TABLE)).split('\n')]
+
+
+class CalculatorCore:
+    def __init__(self, cache_size=256, history_size=1000, history_path=None, units_path=None,
+                 game_factory=None):
+        self.expression = ""
+        self.display = "0"
+        self.last_expression = ""
+        self.history = HistoryStore(history_size, history_path)
+        self.registers = {}      # name -> value; 'M' is the keypad's own
+        self.register = 'M'      # the register MC, MR, M+ and M- act on
+        self.last_result = None  # (display text, value) of the last "="
+        self.is_degree = True
+        self.backend = 'float'  # float, decimal or fraction
+        self.precision = 28     # significant digits for the decimal backend
+        # Makes the game on first use: a Game, or a multi-player session (see
+        # game_sessions.py)
+        self.game_factory = game_factory
+        self._game = None
+        self._game_state = {}  # game.* entries restored before the game was made
+        self.expr_cache = ExpressionCache(cache_size)
+        self.units_path = units_path
+        self._units = None
+        self._symbolic = None
+
+    @property
+    def game(self):
+        if self._game is None:
+            if self.game_factory is not None:
+                game = self.game_factory()
+            else:
+                from questions import Game
+                game = Game()
+            self._game = game
+            self.restore_game(self._game_state)
+        return self._game
+
+    @game.setter
+    def game(self, game):
+        self._game = game
+
+    @property
+    def units(self):
+        if self._units is None:
+            from units import default_registry
+            self._units = default_registry(self.units_path)
+        return self._units
+
+    @property
+    def symbolic(self):
+        if self._symbolic is None:
+            from symbolic import Symbolic
+            self._symbolic = Symbolic(self.expr_cache.max_bits)
+        return self._symbolic
+
+    #  KEYPAD
+    def press(self, value):
+        if value == 'C':
+            self.clear()
+        elif value == '⌫':
+            self.backspace()
+        elif value == '=':
+            self.calculate()
+        elif value == 'MC':
+            self.registers.pop(self.register, None)
+        elif value == 'MR':
+            self.append(format_result(self.memory, self.precision))
+        elif value in ('M+', 'M-'):
+            current = self.current_value()
+            if current is None:
+                return
+            self.add_to_memory(current if value == 'M+' else -current)
+        elif value in ('π', 'e') and self.backend == 'decimal':
+            # More digits than str(math.pi) when the backend can use them
+            with localcontext() as ctx:
+                ctx.prec = self.precision
+                constant = decimal_math.pi() if value == 'π' else Decimal(1).exp()
+            self.append(str(constant))
+        elif value == '1/x':
+            self.expression = f'1/({self.expression})'
+            self.update_display()
+        else:
+            self.append(FUNCTION_KEYS.get(value, value))
+
+    def feed(self, text):
+        # Whole expressions at once (paste, scripts, scanners). Every line that
+        # ends in a newline is evaluated once, as if typed and followed by "=";
+        # the first continues whatever was already typed. Text after the last
+        # newline is left as the current input.
+        # Returns [(expression, result text or "Error: ...")] per evaluated line.
+        *complete, tail = split_input(text)
+        results = []
+        for i, line in enumerate(complete):
+            self.expression = self.expression + line if i == 0 else line
+            if not self.expression:
+                continue
+            try:
+                self.calculate()
+            except CalculationError as e:
+                results.append((self.expression, f"Error: {e}"))
+            else:
+                results.append((self.last_expression, self.display))
+        if not complete:
+            self.append(tail)
+        elif tail:
+            self.expression = tail
+            self.update_display()
+        return results
+
+    #  MEMORY
+    @property
+    def memory(self):
+        return self.registers.get(self.register, 0)
+
+    @property
+    def memory_active(self):
+        return self.register in self.registers
+
+    def select_register(self, name):
+        name = name.strip()
+        if not name:
+            raise ValueError("Register names can't be empty")
+        self.register = name
+
+    def current_value(self):
+        # The number on the display. While the result of "=" is still shown
+        # that is the value itself, so nothing is re-parsed or rounded.
+        if self.last_result is not None and self.last_result[0] == self.display:
+            return self.last_result[1]
+        try:
+            return float(self.display)
+        except ValueError:
+            return None
+
+    def add_to_memory(self, value):
+        if isinstance(value, complex):  # e.g. (-8)**0.5; registers hold real numbers
+            raise CalculationError("Memory can't hold complex numbers")
+        try:
+            total = self.memory + value
+        except TypeError:  # e.g. a Decimal register and a Fraction result
+            total = float(self.memory) + float(value)
+        if isinstance(total, Fraction) and total.denominator == 1:
+            total = total.numerator  # as "=" would show it
+        self.registers[self.register] = total
+
+    #  SESSION
+    def snapshot(self):
+        # Everything needed to carry on where the user left off, as flat
+        # {key: value} (see session_store.py). The history has its own file.
+        state = {
+            'expression': self.expression,
+            'display': self.display,
+            'last_expression': self.last_expression,
+            'is_degree': self.is_degree,
+            'backend': self.backend,
+            'precision': self.precision,
+            'register': self.register,
+        }
+        if self._game is not None:
+            state.update({'game.tier': self._game.tier, 'game.score': self._game.score})
+        else:
+            state.update(self._game_state)
+        for name, value in self.registers.items():
+            state[MEMORY_PREFIX + name] = value
+        return state
+
+    def restore(self, state):
+        # Inverse of snapshot(); missing or unusable entries keep their defaults
+        self.expression = state.get('expression', self.expression)
+        self.display = state.get('display', self.display)
+        self.last_expression = state.get('last_expression', self.last_expression)
+        self.is_degree = bool(state.get('is_degree', self.is_degree))
+        if state.get('backend') in BACKENDS:
+            self.backend = state['backend']
+        if isinstance(state.get('precision'), int):
+            self.precision = state['precision']
+        self.register = state.get('register') or self.register
+        self.registers = {key[len(MEMORY_PREFIX):]: value for key, value in state.items()
+                          if key.startswith(MEMORY_PREFIX)}
+        self._game_state = {key: state[key] for key in GAME_KEYS if key in state}
+        if self._game is not None:
+            self.restore_game(self._game_state)
+
+    def restore_game(self, state):
+        tier = state.get('game.tier')
+        if tier is not None and tier != self._game.tier:
+            try:
+                self._game.new_game(tier=tier)
+            except ValueError:
+                pass
+        self._game.score = state.get('game.score', self._game.score)
+
+    def append(self, text):
+        self.expression += text
+        self.update_display()
+
+    def clear(self):
+        self.expression = ""
+        self.display = "0"
+        self.last_expression = ""
+
+    def backspace(self):
+        self.expression = self.expression[:-1]
+        self.update_display()
+
+    def update_display(self):
+        self.display = self.expression if self.expression else "0"
+
+    def toggle_deg_rad(self):
+        self.is_degree = not self.is_degree
+        return self.is_degree
+
+    def set_backend(self, backend, precision=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}")
+        self.backend = backend
+        if precision is not None:
+            self.precision = precision
+
+    def cycle_backend(self):
+        self.backend = BACKENDS[(BACKENDS.index(self.backend) + 1) % len(BACKENDS)]
+        return self.backend
+
+    def evaluate(self, expression, is_degree=None):
+        if is_degree is None:
+            is_degree = self.is_degree
+        return calculate_text(self.expr_cache, expression, is_degree,
+                              self.backend, self.precision)[1]
+
+    def evaluate_many(self, expression, values, variable='x'):
+        # Imported here so NumPy is only loaded by callers that need batches
+        from batch import evaluate_many
+        return evaluate_many(expression, values, self.is_degree, variable)
+
+    def calculate_many(self, expressions, jobs=None, ordered=True):
+        # Whole batches of independent expressions on all cores (parallel.py).
+        # Failed ones give a CalculationError in their place. For repeated
+        # batches keep a ParallelEvaluator open instead: starting the worker
+        # processes is the expensive part.
+        from parallel import ParallelEvaluator
+        with ParallelEvaluator(jobs, is_degree=self.is_degree, backend=self.backend,
+                               precision=self.precision) as pool:
+            yield from pool.imap(expressions, ordered)
+
+    def calculate(self):
+        try:
+            self.expression, result = calculate_text(self.expr_cache, self.expression,
+                                                     self.is_degree, self.backend,
+                                                     self.precision)
+        except CalculationError:
+            self.fail_calculation()
+            raise
+        return self.finish_calculation(result)
+
+    # calculate() in two halves, for callers that evaluate somewhere else
+    # (see guarded.py): begin returns the expression to evaluate, then finish
+    # or fail records the outcome
+    def begin_calculation(self):
+        self.expression = balance_parens(self.expression)
+        return self.expression
+
+    def finish_calculation(self, result):
+        text = format_result(result, self.precision)
+
+        self.history.append(self.expression, text, 'DEG' if self.is_degree else 'RAD')
+        self.last_expression = self.expression
+        self.display = text
+        self.expression = text
+        self.last_result = (text, result)
+        return result
+
+    def fail_calculation(self):
+        self.display = "Error"
+
+    #  SYMBOLIC
+    # Formulas in x (or any other names), kept as expressions: see symbolic.py
+    def simplify(self, text):
+        sym = self.symbolic
+        return run_symbolic(lambda: sym.to_text(sym.parse(text), self.precision))
+
+    def differentiate(self, text, variable='x'):
+        sym = self.symbolic
+        return run_symbolic(lambda: sym.to_text(
+            sym.derivative(sym.parse(text), variable, self.is_degree), self.precision))
+
+    def evaluate_symbolic(self, text, values=None):
+        # values: {name: number}; parts of the formula that didn't change since
+        # the last call are not recomputed
+        sym = self.symbolic
+        return run_symbolic(lambda: sym.evaluate(sym.parse(text), values, self.is_degree,
+                                                 self.backend, self.precision))
+
+    #  PLOT
+    def plot(self, expression, lo, hi, **options):
+        # Imported here, like batch, so NumPy is only loaded when plotting
+        from plotting import Plot
+        return Plot(expression, lo, hi, self.is_degree, **options)
+
+    def tabulate(self, expression, lo, hi, count=21):
+        from plotting import tabulate
+        return tabulate(expression, lo, hi, count, self.is_degree, precision=self.precision)
+
+    #  CONVERTER
+    def convert_units(self, value, from_u, to_u, conv_type="length"):
+        return self.units.convert(float(value), from_u, to_u, conv_type)
+
+    #  GAME
+    def new_game(self, seed=None, tier=None):
+        return self.game.new_game(seed, tier)
+
+    def generate_question(self):
+        return self.game.generate_question()
+
+    def check_answer(self, text):
+        # Raises ValueError for input that is not a number
+        return self.game.check_answer(text)
+
+    def reset_game(self):
+        self.game.reset_game()
+
+    @property
+    def game_score(self):
+        return self.game.score
+
+    @property
+    def game_question(self):
+        return self.game.question
+
+    @property
+    def game_answer(self):
+        return self.game.answer
+
+    @property
+    def game_tier(self):
+        return self.game.tier
+
+    @property
+    def questions(self):
+        return self.game.questions
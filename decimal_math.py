@@ -0,0 +1,113 @@
+from decimal import Decimal, getcontext, localcontext
+
+# Trigonometry for decimal.Decimal at the current context precision, after the
+# recipes in the decimal module documentation. Every function works with a few
+# guard digits and rounds once on return.
+
+_GUARD = 5
+_pi_cache = {}
+
+
+def pi():
+    prec = getcontext().prec
+    cached = _pi_cache.get(prec)
+    if cached is not None:
+        return +cached
+    with localcontext() as ctx:
+        ctx.prec += _GUARD
+        three = Decimal(3)
+        lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+        while s != lasts:
+            lasts = s
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            s += t
+    _pi_cache[prec] = s
+    return +s
+
+
+def _reduce(x):
+    # Bring the argument into [-pi, pi] so the series converge quickly
+    return x.remainder_near(2 * pi())
+
+
+def cos(x):
+    with localcontext() as ctx:
+        ctx.prec += _GUARD
+        x = _reduce(+x)
+        i, lasts, s, fact, num, sign = 0, 0, 1, 1, 1, 1
+        while s != lasts:
+            lasts = s
+            i += 2
+            fact *= i * (i - 1)
+            num *= x * x
+            sign *= -1
+            s += num / fact * sign
+    return +s
+
+
+def sin(x):
+    with localcontext() as ctx:
+        ctx.prec += _GUARD
+        x = _reduce(+x)
+        i, lasts, s, fact, num, sign = 1, 0, x, 1, x, 1
+        while s != lasts:
+            lasts = s
+            i += 2
+            fact *= i * (i - 1)
+            num *= x * x
+            sign *= -1
+            s += num / fact * sign
+    return +s
+
+
+def tan(x):
+    with localcontext() as ctx:
+        ctx.prec += _GUARD
+        c = cos(x)
+        if c == 0:
+            raise ZeroDivisionError("tan is undefined here")
+        result = sin(x) / c
+    return +result
+
+
+def atan(x):
+    with localcontext() as ctx:
+        ctx.prec += _GUARD
+        x = +x
+        # atan(x) = 2 * atan(x / (1 + sqrt(1 + x*x))) shrinks the argument
+        doublings = 0
+        while abs(x) > Decimal('0.1'):
+            x = x / (1 + (1 + x * x).sqrt())
+            doublings += 1
+        i, lasts, s, num, sign = 1, 0, x, x, 1
+        while s != lasts:
+            lasts = s
+            i += 2
+            num *= x * x
+            sign *= -1
+            s += num / i * sign
+        s *= 2 ** doublings
+    return +s
+
+
+def asin(x):
+    if abs(x) > 1:
+        raise ValueError("math domain error")
+    with localcontext() as ctx:
+        ctx.prec += _GUARD
+        if abs(x) == 1:
+            result = pi() / 2 * x
+        else:
+            result = atan(x / (1 - x * x).sqrt())
+    return +result
+
+
+def acos(x):
+    if abs(x) > 1:
+        raise ValueError("math domain error")
+    with localcontext() as ctx:
+        ctx.prec += _GUARD
+        result = pi() / 2 - asin(x)
+    return +result
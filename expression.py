@@ -0,0 +1,539 @@
+import math
+import operator
+import re
+from collections import OrderedDict
+from decimal import MAX_EMAX, Context, Decimal, Overflow, getcontext, localcontext
+from fractions import Fraction
+from functools import lru_cache
+
+import decimal_math
+
+# Expression engine: tokenize -> parse to an AST of tuples -> compile to closures
+# Nodes: ('num', value, text) ('var', name) ('neg', node) ('pos', node)
+#        ('bin', op, left, right) ('call', name, node)
+# One AST compiles against several numeric backends:
+#   'float'    binary floats, results rounded to 10 places (the default)
+#   'decimal'  decimal.Decimal at a configurable precision (% and // follow
+#              Decimal's truncating rules rather than Python's flooring ones)
+#   'fraction' exact fractions.Fraction; irrational functions fall back to float
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+      | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+      | (?P<op>\*\*|//|[-+*/%()])
+    )''', re.VERBOSE)
+
+BINARY_OPS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '//': operator.floordiv,
+    '%': operator.mod,
+    '**': operator.pow,
+}
+
+BACKENDS = ('float', 'decimal', 'fraction')
+
+# Exact int/Fraction powers and factorials whose result would be larger than
+# this are refused up front instead of freezing the caller while computing them
+MAX_RESULT_BITS = 1 << 22
+
+# Integers longer than this are displayed in scientific notation
+MAX_DISPLAY_DIGITS = 1000
+
+FUNCTIONS = ('sin', 'cos', 'tan', 'asin', 'acos', 'atan',
+             'sqrt', 'log', 'ln', 'log10', 'factorial', 'abs')
+
+
+def _deg_sin(v):
+    return math.sin(math.radians(v))
+
+
+def _deg_cos(v):
+    return math.cos(math.radians(v))
+
+
+def _deg_tan(v):
+    return math.tan(math.radians(v))
+
+
+def _deg_asin(v):
+    return math.degrees(math.asin(v))
+
+
+def _deg_acos(v):
+    return math.degrees(math.acos(v))
+
+
+def _deg_atan(v):
+    return math.degrees(math.atan(v))
+
+
+# ln and log are both the natural log: the keypad's "log" inserts log10(
+COMMON_FUNCS = {
+    'sqrt': math.sqrt,
+    'log': math.log,
+    'ln': math.log,
+    'log10': math.log10,
+    'factorial': math.factorial,
+    'abs': abs,
+}
+
+RAD_FUNCS = dict(COMMON_FUNCS, sin=math.sin, cos=math.cos, tan=math.tan,
+                 asin=math.asin, acos=math.acos, atan=math.atan)
+
+DEG_FUNCS = dict(COMMON_FUNCS, sin=_deg_sin, cos=_deg_cos, tan=_deg_tan,
+                 asin=_deg_asin, acos=_deg_acos, atan=_deg_atan)
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    end = len(text)
+    match = TOKEN_RE.match
+    while pos < end:
+        m = match(text, pos)
+        if m is None or m.end() == pos:
+            if text[pos:].strip() == '':
+                break
+            raise ExpressionError(f"Unexpected character {text[pos]!r} at {pos}")
+        kind = m.lastgroup
+        tokens.append((kind, m.group(kind)))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def take(self, value=None):
+        tok = self.peek()
+        if tok[0] is None or (value is not None and tok[1] != value):
+            raise ExpressionError(f"Expected {value or 'more input'}")
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        if not self.tokens:
+            raise ExpressionError("Empty expression")
+        node = self.expr()
+        if self.pos != len(self.tokens):
+            raise ExpressionError(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def expr(self):
+        node = self.term()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            op = self.take()[1]
+            node = ('bin', op, node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek()[0] == 'op' and self.peek()[1] in ('*', '/', '//', '%'):
+            op = self.take()[1]
+            node = ('bin', op, node, self.unary())
+        return node
+
+    def unary(self):
+        kind, value = self.peek()
+        if kind == 'op' and value in ('+', '-'):
+            self.take()
+            return ('neg' if value == '-' else 'pos', self.unary())
+        return self.power()
+
+    def power(self):
+        node = self.atom()
+        if self.peek() == ('op', '**'):
+            self.take()
+            # Right-associative and binds tighter than a unary minus on its left
+            node = ('bin', '**', node, self.unary())
+        return node
+
+    def atom(self):
+        kind, value = self.take()
+        if kind == 'num':
+            if '.' in value or 'e' in value or 'E' in value:
+                return ('num', float(value), value)
+            return ('num', int(value), value)
+        if kind == 'name':
+            if self.peek() == ('op', '('):
+                if value not in FUNCTIONS:
+                    raise ExpressionError(f"Unknown function {value!r}")
+                self.take('(')
+                arg = self.expr()
+                self.take(')')
+                return ('call', value, arg)
+            return ('var', value)
+        if value == '(':
+            node = self.expr()
+            self.take(')')
+            return node
+        raise ExpressionError(f"Unexpected {value!r}")
+
+
+def parse(text):
+    try:
+        return _Parser(tokenize(text)).parse()
+    except RecursionError:
+        raise ExpressionError("Expression nested too deeply")
+
+
+def _rational_bits(value):
+    if isinstance(value, Fraction):
+        return max(math.log2(abs(value.numerator) or 1), math.log2(value.denominator))
+    return math.log2(abs(value) or 1)
+
+
+def _power(base, exp, max_bits):
+    if isinstance(exp, Fraction) and exp.denominator == 1:
+        exp = exp.numerator
+    if (isinstance(exp, int) and abs(exp) > 1 and isinstance(base, (int, Fraction))
+            and abs(exp) * _rational_bits(base) > max_bits):
+        raise OverflowError("Result too large")
+    return base ** exp
+
+
+def _factorial(value, max_bits):
+    if isinstance(value, Fraction) and value.denominator == 1:
+        value = value.numerator
+    if isinstance(value, int) and value > 1 and math.lgamma(value + 1) / math.log(2) > max_bits:
+        raise OverflowError("Result too large")
+    return math.factorial(value)
+
+
+def _fraction_sqrt(value):
+    # Exact for squares of rationals, float otherwise
+    if isinstance(value, (int, Fraction)) and value >= 0:
+        value = Fraction(value)
+        num, den = math.isqrt(value.numerator), math.isqrt(value.denominator)
+        if num * num == value.numerator and den * den == value.denominator:
+            return Fraction(num, den)
+    return math.sqrt(value)
+
+
+def _decimal_factorial(value):
+    n = int(value)
+    if n != value or n < 0:
+        raise ValueError("factorial() only accepts non-negative integral values")
+    if n <= 1000:
+        return +Decimal(math.factorial(n))
+    # Too many digits to keep: multiply at context precision instead. Results
+    # past the exponent limit are refused before spending any time on them
+    if math.lgamma(n + 1) / math.log(10) > getcontext().Emax:
+        raise OverflowError("Result too large")
+    acc = Decimal(1)
+    for i in range(2, n + 1):
+        acc *= i
+    return acc
+
+
+# sin, cos and tan at 0, 90, 180 and 270 degrees. Multiples of 90 are looked
+# up rather than converted, which would leave e.g. cos(90) = 1.4E-33 where the
+# float backend gives 0. None: undefined.
+_QUADRANTS = {
+    'sin': (0, 1, 0, -1),
+    'cos': (1, 0, -1, 0),
+    'tan': (0, None, 0, None),
+}
+
+
+def _degrees_in(fn, quadrants):
+    # Degrees are converted with guard digits so that e.g. cos(60) gives 0.5
+    def run(v):
+        if v.is_finite() and v.adjusted() < getcontext().prec and not v % 90:
+            value = quadrants[int(v // 90) % 4]
+            if value is None:
+                raise ZeroDivisionError("tan is undefined here")
+            return Decimal(value)
+        with localcontext() as ctx:
+            ctx.prec += 5
+            result = fn(v * decimal_math.pi() / 180)
+        return +result
+    return run
+
+
+def _degrees_out(fn):
+    def run(v):
+        with localcontext() as ctx:
+            ctx.prec += 5
+            result = fn(v) * 180 / decimal_math.pi()
+        return +result
+    return run
+
+
+def _decimal_log(method):
+    # Decimal gives -Infinity for log(0); math raises, and so does this
+    def run(v):
+        if not v:
+            raise ValueError("math domain error")
+        return method(v)
+    return run
+
+
+def _decimal_mod(a, b):
+    # Decimal signals InvalidOperation for x % 0
+    if not b:
+        raise ZeroDivisionError("modulo by zero")
+    return a % b
+
+
+def _decimal_pow(a, b):
+    # and gives Infinity for 0 ** -1
+    if not a and b < 0:
+        raise ZeroDivisionError("0 cannot be raised to a negative power")
+    return a ** b
+
+
+def _decimal_functions(is_degree):
+    trig = {
+        'sin': decimal_math.sin, 'cos': decimal_math.cos, 'tan': decimal_math.tan,
+        'asin': decimal_math.asin, 'acos': decimal_math.acos, 'atan': decimal_math.atan,
+    }
+    if is_degree:
+        trig = {name: (_degrees_out(fn) if name.startswith('a')
+                       else _degrees_in(fn, _QUADRANTS[name]))
+                for name, fn in trig.items()}
+    return dict(trig, **{
+        'sqrt': lambda v: v.sqrt(),
+        'log': _decimal_log(Decimal.ln),
+        'ln': _decimal_log(Decimal.ln),
+        'log10': _decimal_log(Decimal.log10),
+        'factorial': _decimal_factorial,
+        'abs': abs,
+        '**': _decimal_pow,
+        '%': _decimal_mod,
+    })
+
+
+@lru_cache(maxsize=None)
+def function_table(is_degree=True, backend='float', max_bits=MAX_RESULT_BITS):
+    if backend == 'decimal':
+        return _decimal_functions(is_degree)
+    funcs = dict(DEG_FUNCS if is_degree else RAD_FUNCS)
+    funcs['factorial'] = lambda v: _factorial(v, max_bits)
+    funcs['**'] = lambda a, b: _power(a, b, max_bits)
+    if backend == 'fraction':
+        funcs['sqrt'] = _fraction_sqrt
+    elif backend != 'float':
+        raise ValueError(f"Unknown backend {backend!r}")
+    return funcs
+
+
+def _literal(node, backend):
+    if backend == 'decimal':
+        return Decimal(node[2])
+    if backend == 'fraction':
+        return Fraction(node[2])
+    return node[1]
+
+
+def _compile(node, funcs, variable, backend):
+    kind = node[0]
+    if kind == 'num':
+        value = _literal(node, backend)
+        return lambda x: value
+    if kind == 'var':
+        if node[1] != variable:
+            raise ExpressionError(f"Unknown name {node[1]!r}")
+        return lambda x: x
+    if kind == 'neg':
+        inner = _compile(node[1], funcs, variable, backend)
+        return lambda x: -inner(x)
+    if kind == 'pos':
+        inner = _compile(node[1], funcs, variable, backend)
+        return lambda x: +inner(x)
+    if kind == 'call':
+        fn = funcs[node[1]]
+        inner = _compile(node[2], funcs, variable, backend)
+        return lambda x: fn(inner(x))
+    if node[1] == '**':
+        base = _compile(node[2], funcs, variable, backend)
+        exp = _compile(node[3], funcs, variable, backend)
+        pow_ = funcs.get('**', operator.pow)
+        return lambda x: pow_(base(x), exp(x))
+
+    # Long left-leaning chains like 1+2+3+... are evaluated in a loop so that
+    # pasted expressions do not hit the recursion limit
+    chain = []
+    while node[0] == 'bin' and node[1] != '**':
+        op = funcs.get(node[1], BINARY_OPS[node[1]])  # a backend's own % (decimal)
+        chain.append((op, _compile(node[3], funcs, variable, backend)))
+        node = node[2]
+    chain.reverse()
+    first = _compile(node, funcs, variable, backend)
+    if len(chain) == 1:
+        (op, right), = chain
+        return lambda x: op(first(x), right(x))
+
+    def run(x):
+        acc = first(x)
+        for op, right in chain:
+            acc = op(acc, right(x))
+        return acc
+    return run
+
+
+def compile_ast(node, is_degree=True, variable=None, funcs=None, backend='float',
+                precision=28, max_bits=MAX_RESULT_BITS):
+    if funcs is None:
+        funcs = function_table(is_degree, backend, max_bits)
+    try:
+        fn = _compile(node, funcs, variable, backend)
+    except RecursionError:
+        raise ExpressionError("Expression nested too deeply")
+    if backend != 'decimal':
+        return fn
+
+    ctx = Context(prec=precision)
+
+    def run(x):
+        with localcontext(ctx):
+            try:
+                return fn(x)
+            except Overflow:
+                raise OverflowError("Result too large")
+    return run
+
+
+def compile_expression(text, is_degree=True, variable=None, backend='float', precision=28,
+                       max_bits=MAX_RESULT_BITS):
+    return compile_ast(parse(text), is_degree, variable, backend=backend,
+                       precision=precision, max_bits=max_bits)
+
+
+def balance_parens(expr):
+    # Auto-close any parentheses left open, like pressing ")" until balanced
+    missing = expr.count('(') - expr.count(')')
+    if missing > 0:
+        expr += ')' * missing
+    return expr
+
+
+def normalize_result(result):
+    if isinstance(result, float):
+        if result.is_integer():
+            return int(result)
+        return round(result, 10)
+    if isinstance(result, Fraction) and result.denominator == 1:
+        return result.numerator
+    return result
+
+
+def _approximate(n):
+    # Leading digits of a huge integer without converting all of it to text:
+    # the top 64 bits times 2**shift, in a wide decimal context
+    with localcontext(Context(prec=30, Emax=MAX_EMAX)):
+        shift = max(abs(n).bit_length() - 64, 0)
+        return Decimal(abs(n) >> shift) * Decimal(2) ** shift
+
+
+def _scientific(value, negative):
+    return ('-' if negative else '') + f"{value:.9e}"
+
+
+def format_result(value, precision=28):
+    # Display text for a result; stays cheap however large the value is.
+    # `precision` is the decimal backend's, to tell exact integers from rounded ones
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, int):
+        if value.bit_length() > MAX_DISPLAY_DIGITS * 3.32:
+            return _scientific(_approximate(value), value < 0)
+        return str(value)
+    if isinstance(value, Fraction):
+        num, den = value.numerator, value.denominator
+        if den == 1:  # memory arithmetic can leave a whole Fraction
+            return format_result(num)
+        if max(abs(num).bit_length(), den.bit_length()) > MAX_DISPLAY_DIGITS * 3.32:
+            with localcontext(Context(prec=30, Emax=MAX_EMAX, Emin=-MAX_EMAX)):
+                return _scientific(_approximate(num) / _approximate(den), num < 0)
+        # Terminating decimals (denominator 2**a * 5**b) are shown exactly
+        twos = (den & -den).bit_length() - 1
+        rest, fives = den >> twos, 0
+        while rest % 5 == 0:
+            rest //= 5
+            fives += 1
+        if rest == 1 and max(twos, fives) <= 30:
+            places = max(twos, fives)
+            digits = str(abs(num) * (10 ** places // den)).rjust(places + 1, '0')
+            return ('-' if num < 0 else '') + digits[:-places] + '.' + digits[-places:]
+        return f"{num}/{den}"
+    if isinstance(value, Decimal):
+        if (value.is_finite() and value == value.to_integral_value()
+                and value.adjusted() < min(precision, MAX_DISPLAY_DIGITS)):
+            return format(value.to_integral_value(), 'f')
+        mantissa, _, exponent = str(value).partition('E')
+        if '.' in mantissa:
+            mantissa = mantissa.rstrip('0').rstrip('.')
+        return mantissa + ('E' + exponent if exponent else '')
+    return str(value)
+
+
+def evaluate(text, is_degree=True, backend='float', precision=28):
+    return normalize_result(compile_expression(text, is_degree, backend=backend,
+                                               precision=precision)(None))
+
+
+class ExpressionCache:
+    # Bounded LRU of compiled expressions keyed by expression, angle mode and
+    # numeric backend (plus the precision, for the decimal backend)
+    def __init__(self, maxsize=256, max_bits=MAX_RESULT_BITS):
+        self.maxsize = maxsize
+        self.max_bits = max_bits
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, text, is_degree=True, backend='float', precision=28):
+        key = (text, is_degree, backend, precision if backend == 'decimal' else None)
+        entries = self._entries
+        compiled = entries.get(key)
+        if compiled is not None:
+            self.hits += 1
+            entries.move_to_end(key)
+            return compiled
+        self.misses += 1
+        compiled = compile_expression(text, is_degree, backend=backend, precision=precision,
+                                      max_bits=self.max_bits)
+        if self.maxsize > 0:
+            entries[key] = compiled
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self.evictions += 1
+        return compiled
+
+    def evaluate(self, text, is_degree=True, backend='float', precision=28):
+        return normalize_result(self.get(text, is_degree, backend, precision)(None))
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        while len(self._entries) > max(maxsize, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'size': len(self._entries),
+                'maxsize': self.maxsize}
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+
+from questions import Game
+
+# Math Challenge for many players at once, e.g. a classroom. Every player has
+# a session (a Game) whose answers are timed and whose scores are saved to
+# SQLite. The leaderboard is a sorted list of (-best score, name) kept up to
+# date as scores change, so reading the top N never scans all players.
+#
+#   sessions = GameSessions('scores.sqlite3', seed=2024)
+#   alice = sessions.join('alice')
+#   alice.generate_question(); alice.check_answer('42')
+#   sessions.leaderboard(10)
+#
+# All players of a GameSessions get the same question sequence (same seed),
+# so results are comparable.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    best INTEGER NOT NULL DEFAULT 0,
+    games INTEGER NOT NULL DEFAULT 0,
+    answered INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0,
+    total_time REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer INTEGER NOT NULL,
+    given TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    seconds REAL,
+    at REAL NOT NULL
+);
+"""
+
+
+class PlayerSession(Game):
+    background = False  # hundreds of players shouldn't mean hundreds of threads
+
+    def __init__(self, name, sessions, tier='normal'):
+        super().__init__(tier)
+        self.name = name
+        self.sessions = sessions
+        self.best = 0
+        self.games = 0
+        self.answered = 0
+        self.correct = 0
+        self.total_time = 0.0  # seconds spent on timed answers
+        self.fastest = None
+        self._game_answered = 0
+
+    def check_answer(self, text):
+        correct = super().check_answer(text)
+        self.sessions._record(self, text, correct, self.last_time)
+        return correct
+
+    def reset_game(self):
+        if self._game_answered:
+            self.sessions._finish(self)
+        super().reset_game()
+
+    def mean_time(self):
+        return self.total_time / self.answered if self.answered else None
+
+    def accuracy(self):
+        return self.correct / self.answered if self.answered else None
+
+
+class GameSessions:
+    def __init__(self, path=None, seed=None, tier='normal'):
+        self.seed = seed
+        self.tier = tier
+        self.players = {}   # name -> PlayerSession
+        self._best = {}     # name -> best score, for every stored player
+        self._ranking = []  # sorted (-best, name)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        if path:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+        for name, best in self._db.execute('SELECT name, best FROM players'):
+            self._best[name] = best
+            self._ranking.append((-best, name))
+        self._ranking.sort()
+
+    def join(self, name):
+        with self._lock:
+            session = self.players.get(name)
+            if session is not None:
+                return session
+            session = PlayerSession(name, self, self.tier)
+            row = self._db.execute('SELECT best, games, answered, correct, total_time '
+                                   'FROM players WHERE name = ?', (name,)).fetchone()
+            if row is None:
+                self._db.execute('INSERT INTO players (name) VALUES (?)', (name,))
+                self._db.commit()
+                self._set_best(name, 0)
+            else:
+                (session.best, session.games, session.answered,
+                 session.correct, session.total_time) = row
+            if self.seed is not None:
+                session.new_game(self.seed)
+            self.players[name] = session
+            return session
+
+    def leave(self, name):
+        with self._lock:
+            session = self.players.pop(name, None)
+            if session is not None:
+                session.reset_game()
+
+    def _set_best(self, name, best):
+        old = self._best.get(name)
+        if old is not None:
+            del self._ranking[bisect_left(self._ranking, (-old, name))]
+        self._best[name] = best
+        insort(self._ranking, (-best, name))
+
+    def _record(self, session, given, correct, seconds):
+        with self._lock:
+            session.answered += 1
+            session._game_answered += 1
+            session.correct += correct
+            if seconds is not None:
+                session.total_time += seconds
+                if session.fastest is None or seconds < session.fastest:
+                    session.fastest = seconds
+            if session.score > session.best:
+                session.best = session.score
+                self._set_best(session.name, session.best)
+            self._db.execute('INSERT INTO answers (player, question, answer, given, correct, '
+                             'seconds, at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (session.name, session.question, int(session.answer), str(given),
+                              int(correct), seconds, time.time()))
+            self._db.execute('UPDATE players SET best = ?, answered = ?, correct = ?, '
+                             'total_time = ? WHERE name = ?',
+                             (session.best, session.answered, session.correct,
+                              session.total_time, session.name))
+            self._db.commit()
+
+    def _finish(self, session):
+        with self._lock:
+            session.games += 1
+            session._game_answered = 0
+            self._db.execute('UPDATE players SET games = ? WHERE name = ?',
+                             (session.games, session.name))
+            self._db.commit()
+
+    def leaderboard(self, limit=10):
+        # [(name, best score)], highest first, ties by name
+        with self._lock:
+            return [(name, -neg) for neg, name in self._ranking[:limit]]
+
+    def rank(self, name):
+        # 1-based position on the leaderboard, None for unknown players
+        with self._lock:
+            best = self._best.get(name)
+            if best is None:
+                return None
+            return bisect_left(self._ranking, (-best, name)) + 1
+
+    def close(self):
+        with self._lock:
+            for session in list(self.players.values()):
+                session.reset_game()
+            self.players.clear()
+            self._db.close()
@@ -0,0 +1,140 @@
+import time
+from fractions import Fraction
+
+from calculator_core import CalculationError, calculate_text, process_cache
+from expression import MAX_RESULT_BITS
+
+# Runs calculations in a separate worker process so that something like
+# factorial(100000) or 9**9**9 never blocks the caller (the Tk main loop).
+# The caller submits a job and polls for it, e.g. from root.after(). A job
+# that runs past its time budget, or is cancelled, is stopped by terminating
+# the worker, which is restarted for the next job. Results larger than the
+# size budget are refused: powers and factorials before they are computed,
+# anything else (a product of two huge numbers) once it has been.
+#
+# The worker compiles through its own ExpressionCache; its counters come back
+# with every reply, see cache_info().
+
+CACHE_COUNTERS = ('hits', 'misses', 'evictions')
+
+
+def _bits(value):
+    if isinstance(value, Fraction):
+        return value.numerator.bit_length() + value.denominator.bit_length()
+    if isinstance(value, int):
+        return value.bit_length()
+    return 0
+
+
+def _worker(conn, cache_size, max_bits):
+    cache = process_cache(cache_size, max_bits)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        job_id, expression, is_degree, backend, precision = job
+        start = time.perf_counter()
+        try:
+            result = calculate_text(cache, expression, is_degree, backend, precision)[1]
+            if _bits(result) > max_bits:
+                ok, value = False, "Result too large"
+            else:
+                ok, value = True, result
+        except CalculationError as e:
+            ok, value = False, str(e)
+        conn.send((job_id, ok, value, cache.info(), time.perf_counter() - start))
+
+
+class GuardedEvaluator:
+    def __init__(self, time_budget=5.0, max_bits=MAX_RESULT_BITS, cache_size=256):
+        self.time_budget = time_budget
+        self.max_bits = max_bits
+        self.cache_size = cache_size
+        self._ctx = None  # multiprocessing is imported when the worker is first started
+        self._process = None
+        self._conn = None
+        self._job = 0
+        self._started = None  # start time of the pending job, None when idle
+        self._cache = None    # the current worker's last cache.info()
+        self.last_seconds = None  # time the last finished job spent evaluating
+        self._retired = dict.fromkeys(CACHE_COUNTERS, 0)  # from workers since stopped
+
+    @property
+    def busy(self):
+        return self._started is not None
+
+    def start(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        if self._ctx is None:
+            import multiprocessing
+            self._ctx = multiprocessing.get_context('spawn')
+        parent, child = self._ctx.Pipe()
+        self._process = self._ctx.Process(target=_worker, daemon=True,
+                                          args=(child, self.cache_size, self.max_bits))
+        self._process.start()
+        child.close()
+        self._conn = parent
+
+    def submit(self, expression, is_degree=True, backend='float', precision=28):
+        if self.busy:
+            raise RuntimeError("A calculation is already running")
+        self.start()
+        self._job += 1
+        self._conn.send((self._job, expression, is_degree, backend, precision))
+        self._started = time.monotonic()
+        return self._job
+
+    def poll(self):
+        # None while the job is running, else (True, result) or (False, message)
+        if not self.busy:
+            return None
+        try:
+            while self._conn.poll():
+                job_id, ok, value, self._cache, seconds = self._conn.recv()
+                if job_id == self._job:
+                    self._started = None
+                    self.last_seconds = seconds
+                    return ok, value
+        except (EOFError, OSError):
+            self.last_seconds = self.elapsed()
+            self._stop()
+            return False, "Invalid expression"
+        if time.monotonic() - self._started > self.time_budget:
+            self.last_seconds = self.elapsed()
+            self._stop()
+            return False, "Calculation took too long"
+        return None
+
+    def cache_info(self):
+        # The worker's compiled-expression cache, counted across restarts
+        info = {'size': 0, 'maxsize': self.cache_size}
+        if self._cache is not None:
+            info.update(self._cache)
+        for name in CACHE_COUNTERS:
+            info[name] = self._retired[name] + info.get(name, 0)
+        return info
+
+    def elapsed(self):
+        return 0.0 if self._started is None else time.monotonic() - self._started
+
+    def cancel(self):
+        if self.busy:
+            self._stop()
+
+    def _stop(self):
+        self._started = None
+        if self._cache is not None:
+            for name in CACHE_COUNTERS:
+                self._retired[name] += self._cache[name]
+            self._cache = None
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(1)
+        if self._conn is not None:
+            self._conn.close()
+        self._process = self._conn = None
+
+    def close(self):
+        self._stop()
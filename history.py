@@ -0,0 +1,164 @@
+import os
+import time
+from bisect import bisect_left, insort
+from collections import deque, namedtuple
+
+# Bounded calculation history with optional append-only persistence.
+# File format: one "timestamp<TAB>mode<TAB>expression<TAB>result" line per entry.
+# Only the newest `capacity` lines are ever read back, and only on first use,
+# so startup cost does not depend on how large the file has grown.
+
+HistoryEntry = namedtuple('HistoryEntry', 'expression result timestamp mode')
+
+_TAIL_BLOCK = 64 * 1024
+
+
+def format_entry(entry):
+    return f"{entry.expression} = {entry.result}"
+
+
+def _clean(text):
+    return str(text).replace('\t', ' ').replace('\n', ' ').replace('\r', ' ')
+
+
+def _read_tail(path, count):
+    # Read backwards from the end of the file until `count` full lines are found
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return []
+    with f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b''
+        while pos > 0 and data.count(b'\n') <= count:
+            step = min(_TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.split(b'\n')
+    if pos > 0:
+        lines = lines[1:]  # first line is probably partial
+    return [line.decode('utf-8', 'replace') for line in lines[-count - 1:] if line]
+
+
+class HistoryStore:
+    def __init__(self, capacity=1000, path=None):
+        self.capacity = capacity
+        self.path = path
+        self._entries = {}          # seq -> HistoryEntry, oldest first
+        self._first = 0             # seq of the oldest entry kept
+        self._next = 0
+        self._by_expression = []    # sorted (expression, seq)
+        self._by_result = {}        # result text -> deque of seqs
+        self._file = None
+        self._loaded = path is None
+
+    def _load(self):
+        self._loaded = True
+        for line in _read_tail(self.path, self.capacity):
+            parts = line.split('\t')
+            if len(parts) != 4:
+                continue
+            try:
+                timestamp = float(parts[0])
+            except ValueError:
+                continue
+            self._add(HistoryEntry(parts[2], parts[3], timestamp, parts[1]))
+
+    def _add(self, entry):
+        seq = self._next
+        self._next += 1
+        self._entries[seq] = entry
+        insort(self._by_expression, (entry.expression, seq))
+        self._by_result.setdefault(entry.result, deque()).append(seq)
+        while len(self._entries) > self.capacity:
+            self._evict()
+
+    def _evict(self):
+        seq = self._first
+        self._first += 1
+        entry = self._entries.pop(seq, None)
+        if entry is None:
+            return
+        i = bisect_left(self._by_expression, (entry.expression, seq))
+        del self._by_expression[i]
+        seqs = self._by_result[entry.result]
+        seqs.popleft()
+        if not seqs:
+            del self._by_result[entry.result]
+
+    def _write(self, entry):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(f"{entry.timestamp:.3f}\t{entry.mode}\t{entry.expression}\t{entry.result}\n")
+        self._file.flush()
+
+    def append(self, expression, result, mode='DEG', timestamp=None):
+        if not self._loaded:
+            self._load()
+        entry = HistoryEntry(_clean(expression), _clean(result),
+                             time.time() if timestamp is None else timestamp, mode)
+        if self.capacity > 0:
+            self._add(entry)
+        if self.path is not None:
+            self._write(entry)
+        return entry
+
+    def recent(self, count=10):
+        if not self._loaded:
+            self._load()
+        if count <= 0:
+            return []
+        start = max(self._first, self._next - count)
+        return [self._entries[seq] for seq in range(start, self._next)]
+
+    def search_prefix(self, prefix, limit=None):
+        if not self._loaded:
+            self._load()
+        index = self._by_expression
+        i = bisect_left(index, (prefix,))
+        found = []
+        while i < len(index) and index[i][0].startswith(prefix):
+            found.append(index[i][1])
+            i += 1
+            if limit is not None and len(found) >= limit:
+                break
+        return [self._entries[seq] for seq in sorted(found)]
+
+    def search_result(self, value):
+        if not self._loaded:
+            self._load()
+        return [self._entries[seq] for seq in self._by_result.get(_clean(value), ())]
+
+    def clear(self):
+        self._entries.clear()
+        self._by_expression.clear()
+        self._by_result.clear()
+        self._first = self._next
+        self._loaded = True
+        if self.path is not None:
+            self.close()
+            if os.path.exists(self.path):
+                open(self.path, 'w').close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        if not self._loaded:
+            self._load()
+        return len(self._entries)
+
+    def __iter__(self):
+        if not self._loaded:
+            self._load()
+        return iter(list(self._entries.values()))
+
+    def __bool__(self):
+        return len(self) > 0
@@ -0,0 +1,215 @@
+import functools
+import io
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+# Timing for the calculator's user-facing operations, plus on-demand
+# profiling. Enabling it replaces the chosen methods on the object with timed
+# wrappers (instance attributes shadowing the class methods); disabling
+# deletes them again. While disabled nothing is wrapped, so it costs nothing.
+#
+#   metrics = Instrumentation()
+#   metrics.enable(calculator)
+#   ...
+#   print(metrics.to_prometheus())
+#
+# Work timed somewhere else, like "=" in the guarded worker process, is added
+# with record() ('evaluate').
+
+OPERATIONS = ('calculate', 'poll_calculation', 'button_click', 'refresh_display',
+              'convert_units', 'switch_mode', 'show_panel', 'cycle_theme')
+
+# Upper bounds in seconds, Prometheus style (the last bucket is +Inf)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([str(b) for b in self.bounds] + ['+Inf'], self.counts)),
+        }
+
+
+class Instrumentation:
+    def __init__(self, operations=OPERATIONS):
+        self.operations = operations
+        self.histograms = {}
+        self._wrapped = []    # (target, name) currently shadowed
+        self._profiler = None
+        self._sampler = None
+
+    @property
+    def enabled(self):
+        return bool(self._wrapped)
+
+    def enable(self, *targets):
+        for target in targets:
+            for name in self.operations:
+                if (target, name) in self._wrapped or not callable(getattr(target, name, None)):
+                    continue
+                setattr(target, name, self._timed(name, getattr(target, name)))
+                self._wrapped.append((target, name))
+
+    def disable(self):
+        for target, name in self._wrapped:
+            vars(target).pop(name, None)
+        self._wrapped = []
+
+    def _timed(self, name, method):
+        histogram = self.histograms.setdefault(name, Histogram())
+        clock = time.perf_counter
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            except BaseException:
+                histogram.errors += 1
+                raise
+            finally:
+                histogram.observe(clock() - start)
+        return timed
+
+    def record(self, name, seconds, error=False):
+        # Only while timing is on, like the wrapped operations
+        if not self._wrapped:
+            return
+        histogram = self.histograms.setdefault(name, Histogram())
+        histogram.observe(seconds)
+        if error:
+            histogram.errors += 1
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    #  EXPORT
+    def snapshot(self):
+        return {name: h.to_dict() for name, h in sorted(self.histograms.items())}
+
+    def to_json(self):
+        return json.dumps({'timestamp': time.time(), 'operations': self.snapshot()}, indent=2)
+
+    def to_prometheus(self, prefix='calculator'):
+        metric = f"{prefix}_operation_seconds"
+        lines = [f"# HELP {metric} Time spent in calculator operations.",
+                 f"# TYPE {metric} histogram"]
+        for name, h in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip([repr(b) for b in h.bounds] + ['+Inf'], h.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{op="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{op="{name}"}} {h.total!r}')
+            lines.append(f'{metric}_count{{op="{name}"}} {h.count}')
+        errors = f"{prefix}_operation_errors_total"
+        lines += [f"# HELP {errors} Calculator operations that raised.",
+                  f"# TYPE {errors} counter"]
+        lines += [f'{errors}{{op="{name}"}} {h.errors}' for name, h in sorted(self.histograms.items())]
+        return "\n".join(lines) + "\n"
+
+    #  PROFILING
+    @property
+    def profiling(self):
+        return self._profiler is not None or self._sampler is not None
+
+    def start_profile(self):
+        # Deterministic profile of everything the calling thread runs
+        if self.profiling:
+            raise RuntimeError("A profile is already running")
+        import cProfile  # with pstats, only loaded when a profile is taken
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def start_sampling(self, interval=0.005):
+        # Low-overhead alternative: a thread records the calling thread's
+        # stack every `interval` seconds
+        if self.profiling:
+            raise RuntimeError("A profile is already running")
+        self._sampler = Sampler(threading.get_ident(), interval)
+        self._sampler.start()
+
+    def stop_profile(self, limit=30):
+        # Report for whichever profile was running, as text
+        if self._profiler is not None:
+            profiler, self._profiler = self._profiler, None
+            profiler.disable()
+            out = io.StringIO()
+            import pstats
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+            return out.getvalue()
+        if self._sampler is not None:
+            sampler, self._sampler = self._sampler, None
+            sampler.stop()
+            return sampler.report(limit)
+        return ""
+
+
+class Sampler(threading.Thread):
+    def __init__(self, thread_id, interval=0.005):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()  # folded stack "outer;...;inner" -> samples
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def report(self, limit=30):
+        # Folded stacks, heaviest first: the input format of flamegraph tools
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common(limit)) + "\n"
@@ -0,0 +1,247 @@
+import multiprocessing
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from multiprocessing import shared_memory
+
+from calculator_core import CalculationError, calculate_text, process_cache
+from expression import MAX_RESULT_BITS, ExpressionCache
+
+# Evaluates large sets of independent expressions (audit tapes, logs) on all
+# cores. The expressions are cut into chunks that a pool of worker processes
+# picks up as they become free, so a chunk of slow factorials doesn't hold up
+# the rest. Each worker compiles the batch's most common expressions once,
+# when it starts, into its own ExpressionCache.
+#
+# Numeric results don't travel back pickled: the workers write them straight
+# into one shared-memory buffer for the whole batch (a float64 and a kind byte
+# per expression), and only what doesn't fit there (errors, exact fractions,
+# decimals, integers past 2**53) comes back with the chunk.
+#
+#   with ParallelEvaluator(jobs=4) as pool:
+#       results = pool.evaluate(expressions)       # input order
+#       for i, result in pool.imap(expressions, ordered=False):
+#           ...                                    # as chunks finish
+#
+# A failed expression gives a CalculationError instance in its place rather
+# than raising, so one bad line doesn't lose the rest of the batch.
+
+EXACT_LIMIT = 2 ** 53
+PENDING, FLOAT, INT = 0, 1, 2  # kind bytes; PENDING: look in the chunk's extras
+WARM_SAMPLE = 10000  # expressions looked at to choose what the workers pre-compile
+MIN_CHUNK, MAX_CHUNK = 64, 4096
+
+_shared = None  # (name, SharedMemory, values view, kinds view) in a worker
+
+
+def _init_worker(cache_size, max_bits, warm, is_degree, backend, precision):
+    cache = process_cache(cache_size, max_bits)
+    for expression in warm:
+        try:
+            cache.get(expression, is_degree, backend, precision)
+        except Exception:
+            pass  # it fails again, with its message, when evaluated
+
+
+def _views(shm, count):
+    return shm.buf[:8 * count].cast('d'), shm.buf[8 * count:9 * count]
+
+
+def _close_shared():
+    global _shared
+    if _shared is not None:
+        _, shm, values, kinds = _shared
+        values.release()
+        kinds.release()
+        shm.close()
+        _shared = None
+
+
+def _attach(name, count):
+    # Workers keep the current batch's buffer open between chunks
+    global _shared
+    if _shared is None or _shared[0] != name:
+        _close_shared()
+        shm = shared_memory.SharedMemory(name=name)
+        _shared = (name, shm) + _views(shm, count)
+    return _shared[2], _shared[3]
+
+
+def _evaluate_chunk(name, count, start, expressions, is_degree, backend, precision):
+    values, kinds = _attach(name, count)
+    cache = process_cache()
+    extras = []
+    for i, expression in enumerate(expressions, start):
+        try:
+            result = calculate_text(cache, expression.strip(), is_degree, backend, precision)[1]
+        except CalculationError as e:
+            extras.append((i, str(e)))
+            continue
+        kind = type(result)
+        if kind is float:
+            values[i] = result
+            kinds[i] = FLOAT
+        elif kind is int and -EXACT_LIMIT < result < EXACT_LIMIT:
+            values[i] = result
+            kinds[i] = INT
+        else:
+            extras.append((i, result))
+    return start, len(expressions), extras
+
+
+def hot_expressions(expressions, limit):
+    # The most repeated expressions among the first WARM_SAMPLE
+    counts = Counter(e.strip() for e in islice(expressions, WARM_SAMPLE))
+    return [e for e, n in counts.most_common(limit) if n > 1]
+
+
+class ParallelEvaluator:
+    def __init__(self, jobs=None, chunk_size=None, is_degree=True, backend='float',
+                 precision=28, cache_size=4096, max_bits=MAX_RESULT_BITS, warm=None):
+        self.jobs = max(jobs or os.cpu_count() or 1, 1)
+        self.chunk_size = chunk_size  # None: chosen per batch
+        self.is_degree = is_degree
+        self.backend = backend
+        self.precision = precision
+        self.cache_size = cache_size
+        self.max_bits = max_bits
+        self.warm = warm  # expressions to pre-compile; None: taken from the first batch
+        self._ctx = multiprocessing.get_context('spawn')
+        self._pool = None
+
+    def start(self, warm=()):
+        if self._pool is None:
+            if self.warm is not None:
+                warm = self.warm
+            self._pool = ProcessPoolExecutor(
+                self.jobs, mp_context=self._ctx, initializer=_init_worker,
+                initargs=(self.cache_size, self.max_bits, list(warm), self.is_degree,
+                          self.backend, self.precision))
+        return self
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _chunk_size(self, count):
+        if self.chunk_size:
+            return self.chunk_size
+        # Several chunks per worker to balance uneven work, but big enough
+        # that scheduling costs little next to evaluating
+        return max(MIN_CHUNK, min(MAX_CHUNK, count // (self.jobs * 8) or 1))
+
+    def imap(self, expressions, ordered=True):
+        # ordered: results in input order; otherwise (index, result) pairs in
+        # the order the chunks finish
+        if not isinstance(expressions, (list, tuple)):
+            expressions = list(expressions)
+        count = len(expressions)
+        if not count:
+            return
+        self.start(hot_expressions(expressions, self.cache_size // 4))
+        size = self._chunk_size(count)
+        shm = shared_memory.SharedMemory(create=True, size=9 * count)
+        values, kinds = _views(shm, count)
+        kinds[:] = bytes(count)
+        # Only a bounded window of chunks is in flight, so a batch that is
+        # slow to consume doesn't queue up everything at once
+        window = deque() if ordered else set()
+        chunks = range(0, count, size)
+        try:
+            for start in chunks:
+                future = self._pool.submit(
+                    _evaluate_chunk, shm.name, count, start, expressions[start:start + size],
+                    self.is_degree, self.backend, self.precision)
+                if ordered:
+                    window.append(future)
+                    if len(window) >= self.jobs * 4:
+                        yield from self._collect(window.popleft(), values, kinds, ordered)
+                else:
+                    window.add(future)
+                    if len(window) >= self.jobs * 4:
+                        yield from self._collect_done(window, values, kinds)
+            while window:
+                if ordered:
+                    yield from self._collect(window.popleft(), values, kinds, ordered)
+                else:
+                    yield from self._collect_done(window, values, kinds)
+        finally:
+            for future in window:
+                future.cancel()
+            values.release()
+            kinds.release()
+            shm.close()
+            shm.unlink()
+
+    def _collect_done(self, window, values, kinds):
+        done, _ = wait(window, return_when=FIRST_COMPLETED)
+        for future in done:
+            window.discard(future)
+            yield from self._collect(future, values, kinds, False)
+
+    def _collect(self, future, values, kinds, ordered):
+        start, length, extras = future.result()
+        results = [None] * length
+        for i in range(length):
+            kind = kinds[start + i]
+            if kind == FLOAT:
+                results[i] = values[start + i]
+            elif kind == INT:
+                results[i] = int(values[start + i])
+        for i, result in extras:
+            results[i - start] = CalculationError(result) if isinstance(result, str) else result
+        if ordered:
+            return results
+        return zip(range(start, start + length), results)
+
+    def evaluate(self, expressions):
+        return list(self.imap(expressions))
+
+
+def evaluate_serial(expressions, is_degree=True, backend='float', precision=28, cache_size=4096):
+    # The single-process equivalent of ParallelEvaluator.evaluate
+    cache = ExpressionCache(cache_size)
+    results = []
+    for expression in expressions:
+        try:
+            results.append(calculate_text(cache, expression.strip(), is_degree, backend,
+                                          precision)[1])
+        except CalculationError as e:
+            results.append(e)
+    return results
+
+
+def scaling_report(expressions, worker_counts, ordered=True, **options):
+    # [(workers, seconds, expressions per second, speedup)], 0 workers being
+    # evaluate_serial in this process. Pool start-up is not timed: the pool
+    # is started and warmed with a first small batch.
+    expressions = list(expressions)
+    rows = []
+    baseline = None
+    for workers in worker_counts:
+        if workers == 0:
+            start = time.perf_counter()
+            evaluate_serial(expressions, options.get('is_degree', True),
+                            options.get('backend', 'float'), options.get('precision', 28))
+            elapsed = time.perf_counter() - start
+        else:
+            with ParallelEvaluator(workers, warm=hot_expressions(expressions, 1024),
+                                   **options) as pool:
+                pool.evaluate(expressions[:workers * MIN_CHUNK])
+                start = time.perf_counter()
+                for _ in pool.imap(expressions, ordered):
+                    pass
+                elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline = elapsed
+        rows.append((workers, elapsed, len(expressions) / elapsed, baseline / elapsed))
+    return rows
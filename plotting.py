@@ -0,0 +1,444 @@
+import bisect
+import heapq
+import math
+import time
+
+from batch import evaluate_many
+from expression import compile_ast, format_result, normalize_result, parse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Plotting and tabulating an expression in x, with the calculator's functions
+# and DEG/RAD setting.
+#
+# Plot samples adaptively: a coarse uniform grid first, then every interval
+# whose midpoint is off the straight line between its ends (or where the
+# function appears or disappears, e.g. at a pole) is halved, pass after pass.
+# Flat stretches stay at the coarse spacing; bends, spikes and edges get as
+# many samples as they need. All points of a pass are evaluated as one batch,
+# which batch.evaluate_many vectorizes when NumPy is installed. steps()
+# yields after every chunk, so a UI can interleave sampling with its events.
+#
+# PlotView draws a Plot on a Tk canvas. However many samples are visible, each
+# pixel column is drawn as at most four points (first, min, max and last
+# value), which is exactly what the full polyline would look like at that
+# width. Without NumPy that reduction runs a chunk at a time between events,
+# so pan and zoom stay responsive with a million samples.
+
+INITIAL_POINTS = 129
+MAX_DEPTH = 12          # an interval of the initial grid is halved at most this often
+TOLERANCE = 0.001       # midpoint error, as a fraction of the plot's height, worth refining
+MAX_POINTS = 1000000
+CHUNK = 4096            # evaluations between yields
+
+
+def _floats(results):
+    # evaluate_many's results as floats, NaN where there is no value
+    nan = math.nan
+    out = []
+    for value in results:
+        try:
+            out.append(nan if value is None else float(value))
+        except (OverflowError, TypeError, ValueError):
+            out.append(nan)
+    return out
+
+
+def _check(expression, is_degree, variable):
+    # Compile once up front so unknown names and syntax errors are raised
+    # here (ExpressionError) rather than in the middle of sampling
+    compile_ast(parse(expression), is_degree, variable)
+
+
+def _needs_split(y0, ym, y1, tolerance):
+    defined = (y0 == y0) + (ym == ym) + (y1 == y1)
+    if defined == 0:
+        return False
+    if defined < 3:
+        return True  # the edge of the domain, or a pole, is in here
+    return abs(ym - (y0 + y1) / 2) > tolerance
+
+
+class Plot:
+    def __init__(self, expression, lo, hi, is_degree=True, variable='x',
+                 initial=INITIAL_POINTS, depth=MAX_DEPTH, tolerance=TOLERANCE,
+                 max_points=MAX_POINTS, chunk=CHUNK):
+        if not hi > lo:
+            raise ValueError("The range must go from a lower to a higher value")
+        _check(expression, is_degree, variable)
+        self.expression = expression
+        self.lo, self.hi = lo, hi
+        self.is_degree = is_degree
+        self.variable = variable
+        self.initial = max(initial, 3)
+        self.depth = depth
+        self.tolerance = tolerance
+        self.max_points = max(max_points, self.initial)
+        self.chunk = chunk
+        self.xs = self.ys = None  # sorted samples, once done (arrays with NumPy)
+        self.grid = None          # values on the initial, uniform grid
+        self.count = 0            # samples evaluated so far
+        self.done = False
+
+    def _evaluate(self, values, out):
+        # Evaluate `values` into `out`, a chunk at a time, yielding in between
+        for start in range(0, len(values), self.chunk):
+            out.extend(_floats(evaluate_many(self.expression, values[start:start + self.chunk],
+                                             self.is_degree, self.variable, normalize=False)))
+            self.count += min(self.chunk, len(values) - start)
+            yield
+
+    def steps(self):
+        lo, hi, n = self.lo, self.hi, self.initial
+        step = (hi - lo) / (n - 1)
+        xs = [lo + i * step for i in range(n - 1)] + [hi]
+        ys = []
+        yield from self._evaluate(xs, ys)
+        self.grid = list(ys)
+
+        finite = [y for y in ys if y == y and abs(y) != math.inf]
+        span = (max(finite) - min(finite)) if finite else 0.0
+        tolerance = self.tolerance * (span or 1.0)
+        smallest = step / 2 ** self.depth
+        # Every interval of the grid gets a look at its midpoint. Intervals
+        # are kept in x order, so each pass's midpoints come out sorted.
+        passes = [(xs, ys)]
+        total = n
+        pending = [(xs[i], ys[i], xs[i + 1], ys[i + 1]) for i in range(n - 1)]
+        while pending and total < self.max_points:
+            pending = pending[:self.max_points - total]
+            mids = [(x0 + x1) / 2 for x0, _, x1, _ in pending]
+            values = []
+            yield from self._evaluate(mids, values)
+            refine = []
+            for i, ((x0, y0, x1, y1), xm, ym) in enumerate(zip(pending, mids, values), 1):
+                if x1 - x0 > 2 * smallest and _needs_split(y0, ym, y1, tolerance):
+                    refine.append((x0, y0, xm, ym))
+                    refine.append((xm, ym, x1, y1))
+                if i % self.chunk == 0:
+                    yield
+            passes.append((mids, values))
+            total += len(mids)
+            pending = refine
+
+        if np is not None:
+            all_x = np.concatenate([np.asarray(p[0]) for p in passes])
+            order = np.argsort(all_x, kind='stable')
+            self.xs = all_x[order]
+            self.ys = np.concatenate([np.asarray(p[1]) for p in passes])[order]
+        else:
+            # Merge the sorted passes, a chunk at a time
+            xs, ys = [], []
+            for i, (x, y) in enumerate(heapq.merge(*(zip(*p) for p in passes)), 1):
+                xs.append(x)
+                ys.append(y)
+                if i % self.chunk == 0:
+                    yield
+            self.xs, self.ys = xs, ys
+        self.done = True
+
+    def run(self):
+        for _ in self.steps():
+            pass
+        return self
+
+    def __len__(self):
+        return 0 if self.xs is None else len(self.xs)
+
+    def visible(self, x0, x1):
+        # (start, stop) indices of the samples in [x0, x1], plus one either
+        # side so lines run off the edge of the view
+        if np is not None and not isinstance(self.xs, list):
+            start, stop = np.searchsorted(self.xs, (x0, x1)).tolist()
+            stop = min(stop + 1, len(self.xs))
+        else:
+            start = bisect.bisect_left(self.xs, x0)
+            stop = min(bisect.bisect_right(self.xs, x1) + 1, len(self.xs))
+        return max(start - 1, 0), stop
+
+    def y_range(self):
+        # Vertical extent that shows the curve without letting a pole
+        # squash it: the 1st to 99th percentile of the evenly spaced values
+        # (refinement crowds samples around poles), padded
+        grid = self.grid[::max(len(self.grid) // 4096, 1)]
+        finite = sorted(y for y in grid if y == y and abs(y) != math.inf)
+        if not finite:
+            return -1.0, 1.0
+        low = finite[len(finite) // 100]
+        high = finite[-1 - len(finite) // 100]
+        if high - low < 1e-12:
+            return low - 1, high + 1
+        pad = (high - low) * 0.08
+        return low - pad, high + pad
+
+
+def tabulate(expression, lo, hi, count=21, is_degree=True, variable='x', precision=28):
+    # [(x text, f(x) text)] at `count` evenly spaced values from lo to hi
+    _check(expression, is_degree, variable)
+    count = max(count, 2)
+    step = (hi - lo) / (count - 1)
+    xs = [lo + i * step for i in range(count - 1)] + [hi]
+    results = evaluate_many(expression, xs, is_degree, variable)
+    return [(format_result(normalize_result(x), precision),
+             "undefined" if y is None else format_result(y, precision))
+            for x, y in zip(xs, results)]
+
+
+def downsample(xs, ys, view, width, height, start=0, stop=None):
+    # Polylines (flat [px, py, px, py, ...] lists) for samples[start:stop] in
+    # view = (x0, x1, y0, y1) on a width x height canvas; at most four points
+    # per pixel column, and a break wherever the function is undefined
+    x0, x1, y0, y1 = view
+    if stop is None:
+        stop = len(xs)
+    sx = width / (x1 - x0)
+    sy = height / (y1 - y0)
+    top, bottom = -height, 2 * height  # keep huge values off Tk's coordinates
+
+    if np is not None and not isinstance(xs, list):
+        return _downsample_numpy(xs[start:stop], ys[start:stop], x0, y1, sx, sy, top, bottom)
+
+    lines, line = [], []
+    column = first = low = high = last = None
+
+    def flush():
+        py = [min(max((y1 - y) * sy, top), bottom) for y in (first, low, high, last)]
+        px = column + 0.5
+        line.extend((px, py[0]))
+        for p in py[1:]:
+            if p != line[-1]:
+                line.extend((px, p))
+
+    for i in range(start, stop):
+        y = ys[i]
+        if y != y or y in (math.inf, -math.inf):
+            if column is not None:
+                flush()
+                column = None
+            if len(line) >= 4:
+                lines.append(line)
+            line = []
+            continue
+        c = int((xs[i] - x0) * sx)
+        if c != column:
+            if column is not None:
+                flush()
+            column, first, low, high, last = c, y, y, y, y
+        else:
+            if y < low:
+                low = y
+            elif y > high:
+                high = y
+            last = y
+    if column is not None:
+        flush()
+    if len(line) >= 4:
+        lines.append(line)
+    return lines
+
+
+def _downsample_numpy(xs, ys, x0, y1, sx, sy, top, bottom):
+    if len(xs) == 0:
+        return []
+    finite = np.isfinite(ys)
+    columns = np.floor((xs - x0) * sx).astype(np.int64)
+    # Runs of samples in one column and on the same side of a gap
+    starts = np.flatnonzero(np.r_[True, (columns[1:] != columns[:-1])
+                                  | (finite[1:] != finite[:-1])])
+    ends = np.r_[starts[1:], len(xs)] - 1
+    keep = finite[starts]
+    line_ids = np.cumsum(~keep)[keep]  # a gap run starts a new line
+    safe = np.where(finite, ys, 0.0)
+    points = np.stack([safe[starts], np.minimum.reduceat(safe, starts),
+                       np.maximum.reduceat(safe, starts), safe[ends]], axis=1)[keep]
+    py = np.clip((y1 - points) * sy, top, bottom)
+    px = np.repeat(columns[starts][keep] + 0.5, 4)
+    coords = np.stack([px, py.ravel()], axis=1)
+    splits = np.flatnonzero(np.diff(line_ids)) + 1
+    return [part.ravel().tolist() for part in np.split(coords, splits * 4) if len(part) >= 2]
+
+
+def nice_ticks(lo, hi, count=6):
+    # Round-numbered tick positions covering [lo, hi]
+    span = hi - lo
+    if span <= 0:
+        return []
+    raw = span / count
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = min((m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw),
+               default=10 * magnitude)
+    first = math.ceil(lo / step)
+    return [k * step for k in range(first, math.floor(hi / step) + 1)]
+
+
+def _label(value):
+    text = f"{value:.6g}"
+    return "0" if text in ("-0", "0") else text
+
+
+class PlotView:
+    # Draws a Plot on a Tk canvas; drag to pan, mouse wheel to zoom.
+    # colors() returns {'grid', 'axis', 'text', 'curve'} for the current theme;
+    # make_plot(lo, hi, points) returns a new Plot when panning or zooming has
+    # gone past the samples there are. Works through the canvas object only,
+    # so it doesn't import tkinter.
+    FRAME_MS = 16          # pan/zoom redraws are coalesced to one per frame
+    BUDGET = 0.012         # seconds of work per event-loop turn
+    DRAW_CHUNK = 20000     # samples reduced per turn without NumPy
+
+    def __init__(self, canvas, colors, make_plot=None):
+        self.canvas = canvas
+        self.colors = colors
+        self.make_plot = make_plot
+        self.plot = None
+        self.view = None          # (x0, x1, y0, y1)
+        self.sampling = None      # Plot being sampled
+        self.sample_job = None
+        self.draw_job = None      # chunked drawing in progress
+        self.redraw_job = None
+        self.drag = None
+        canvas.bind('<ButtonPress-1>', self.start_drag)
+        canvas.bind('<B1-Motion>', self.on_drag)
+        canvas.bind('<MouseWheel>', self.on_wheel)      # Windows, macOS
+        canvas.bind('<Button-4>', lambda e: self.zoom(e.x, e.y, 0.8))  # X11
+        canvas.bind('<Button-5>', lambda e: self.zoom(e.x, e.y, 1.25))
+        canvas.bind('<Configure>', lambda e: self.request_redraw())
+
+    def size(self):
+        return max(self.canvas.winfo_width(), 2), max(self.canvas.winfo_height(), 2)
+
+    def show(self, plot, on_done=None, keep_view=False):
+        # Sample `plot` between events, then draw it
+        self.cancel()
+        if not keep_view:
+            self.plot = self.view = None
+            self.canvas.delete('all')
+            self.canvas.create_text(10, 10, anchor='nw', text="Sampling...",
+                                    fill=self.colors()['text'])
+        self.sampling = plot
+        steps = plot.steps()
+
+        def work():
+            deadline = time.perf_counter() + self.BUDGET
+            try:
+                while time.perf_counter() < deadline:
+                    next(steps)
+            except StopIteration:
+                self.sample_job = None
+                self.sampling = None
+                self.plot = plot
+                if self.view is None:
+                    self.view = (plot.lo, plot.hi) + plot.y_range()
+                self.redraw()
+                if on_done is not None:
+                    on_done(plot)
+                return
+            self.sample_job = self.canvas.after(1, work)
+        work()
+
+    def cancel(self):
+        for job in (self.sample_job, self.draw_job, self.redraw_job):
+            if job is not None:
+                self.canvas.after_cancel(job)
+        self.sample_job = self.draw_job = self.redraw_job = None
+        self.sampling = None
+
+    def request_redraw(self):
+        if self.redraw_job is None and self.plot is not None:
+            self.redraw_job = self.canvas.after(self.FRAME_MS, self.redraw)
+
+    def to_data(self, px, py):
+        width, height = self.size()
+        x0, x1, y0, y1 = self.view
+        return x0 + px / width * (x1 - x0), y1 - py / height * (y1 - y0)
+
+    def start_drag(self, event):
+        self.drag = (event.x, event.y, self.view)
+
+    def on_drag(self, event):
+        if self.drag is None or self.drag[2] is None:
+            return
+        start_x, start_y, (x0, x1, y0, y1) = self.drag
+        width, height = self.size()
+        dx = (event.x - start_x) / width * (x1 - x0)
+        dy = (event.y - start_y) / height * (y1 - y0)
+        self.view = (x0 - dx, x1 - dx, y0 + dy, y1 + dy)
+        self.request_redraw()
+
+    def on_wheel(self, event):
+        self.zoom(event.x, event.y, 0.8 if event.delta > 0 else 1.25)
+
+    def zoom(self, px, py, factor):
+        # Zoom about the point under the cursor
+        if self.view is None:
+            return
+        cx, cy = self.to_data(px, py)
+        x0, x1, y0, y1 = self.view
+        self.view = (cx + (x0 - cx) * factor, cx + (x1 - cx) * factor,
+                     cy + (y0 - cy) * factor, cy + (y1 - cy) * factor)
+        self.request_redraw()
+
+    def redraw(self):
+        self.redraw_job = None
+        if self.draw_job is not None:  # an unfinished draw of an older view
+            self.canvas.after_cancel(self.draw_job)
+            self.draw_job = None
+        plot, canvas = self.plot, self.canvas
+        if plot is None:
+            return
+        colors = self.colors()
+        width, height = self.size()
+        x0, x1, y0, y1 = view = self.view
+        canvas.delete('all')
+
+        # Grid, axes and labels
+        for x in nice_ticks(x0, x1):
+            px = (x - x0) / (x1 - x0) * width
+            canvas.create_line(px, 0, px, height, fill=colors['grid'])
+            canvas.create_text(px + 2, height - 2, anchor='sw', text=_label(x),
+                               fill=colors['text'])
+        for y in nice_ticks(y0, y1):
+            py = (y1 - y) / (y1 - y0) * height
+            canvas.create_line(0, py, width, py, fill=colors['grid'])
+            canvas.create_text(2, py - 2, anchor='sw', text=_label(y), fill=colors['text'])
+        if x0 < 0 < x1:
+            px = -x0 / (x1 - x0) * width
+            canvas.create_line(px, 0, px, height, fill=colors['axis'])
+        if y0 < 0 < y1:
+            py = y1 / (y1 - y0) * height
+            canvas.create_line(0, py, width, py, fill=colors['axis'])
+
+        start, stop = plot.visible(x0, x1)
+        if (self.make_plot is not None and self.sampling is None
+                and (x0 < plot.lo or x1 > plot.hi
+                     or (stop - start < width // 2 and plot.hi - plot.lo > 4 * (x1 - x0)))):
+            # Panned past the samples, or zoomed in far beyond them: sample
+            # the view and a view's width either side. The curve is drawn
+            # when that finishes; drawing the old samples here could paint
+            # them over it.
+            span = x1 - x0
+            self.show(self.make_plot(x0 - span, x1 + span, 3 * width + 1), keep_view=True)
+            return
+
+        def draw(lines):
+            for line in lines:
+                canvas.create_line(*line, fill=colors['curve'], width=2)
+
+        if np is not None and not isinstance(plot.xs, list):
+            draw(downsample(plot.xs, plot.ys, view, width, height, start, stop))
+            return
+
+        # Without NumPy: a chunk per event-loop turn, so a drag or wheel
+        # event can interrupt (and restart) a long draw
+        def work(position):
+            deadline = time.perf_counter() + self.BUDGET
+            while position < stop and time.perf_counter() < deadline:
+                end = min(position + self.DRAW_CHUNK, stop)
+                # One sample of overlap so the chunks join up
+                draw(downsample(plot.xs, plot.ys, view, width, height, max(position - 1, 0), end))
+                position = end
+            self.draw_job = canvas.after(1, work, position) if position < stop else None
+        work(start)
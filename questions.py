@@ -0,0 +1,302 @@
+import random
+import threading
+import time
+from array import array
+from collections import deque
+from fractions import Fraction
+
+# Question generator for the Math Challenge. Questions come from a pool of
+# pre-generated batches, stored compactly as arrays (operator code, operands,
+# answer), which a background thread tops up before it runs dry. The pool has
+# its own random.Random, so a (seed, tier) pair always produces the same
+# sequence of questions: hand out the seed and a whole class gets the same set.
+
+OPERATORS = ('+', '-', '×', '÷')
+
+# Operand ranges per tier and operator. For ÷ the ranges are (divisor,
+# quotient), so every division comes out whole. 'normal' is the original game.
+TIERS = {
+    'easy': {
+        '+': ((1, 20), (1, 20)), '-': ((10, 30), (1, 9)),
+        '×': ((2, 9), (2, 9)), '÷': ((2, 9), (2, 10)),
+    },
+    'normal': {
+        '+': ((10, 100), (10, 100)), '-': ((50, 100), (10, 49)),
+        '×': ((2, 15), (2, 15)), '÷': ((2, 12), (2, 20)),
+    },
+    'hard': {
+        '+': ((100, 999), (100, 999)), '-': ((500, 999), (100, 499)),
+        '×': ((12, 99), (2, 25)), '÷': ((2, 25), (10, 99)),
+    },
+}
+
+
+# The 'adaptive' tier picks operators and operand ranges per player, from
+# running estimates of their accuracy and speed on each operator
+ADAPTIVE = 'adaptive'
+GAME_TIERS = tuple(TIERS) + (ADAPTIVE,)
+EWMA_ALPHA = 0.2       # weight of the newest answer in the running estimates
+TARGET_SECONDS = 8.0   # answers slower than this don't raise the level
+LEVEL_STEP = 0.05      # level change per answer, on a 0 (easy) .. 1 (hard) scale
+
+
+def format_question(op, a, b):
+    return f"{a} {OPERATORS[op]} {b}"
+
+
+def make_question(op, x, y):
+    # (a, b, answer) from two operands drawn from the op's ranges
+    if op == 0:
+        return x, y, x + y
+    if op == 1:
+        return x, y, x - y
+    if op == 2:
+        return x, y, x * y
+    return x * y, x, y
+
+
+def generate_batch(rng, ranges, size):
+    # (ops, a, b, answers) arrays for `size` questions
+    ops, first, second, answers = array('B'), array('q'), array('q'), array('q')
+    spans = [(lo1, hi1 - lo1 + 1, lo2, hi2 - lo2 + 1)
+             for (lo1, hi1), (lo2, hi2) in (ranges[op] for op in OPERATORS)]
+    rand = rng.random
+    for _ in range(size):
+        op = int(rand() * 4)
+        lo1, n1, lo2, n2 = spans[op]
+        a, b, answer = make_question(op, lo1 + int(rand() * n1), lo2 + int(rand() * n2))
+        ops.append(op)
+        first.append(a)
+        second.append(b)
+        answers.append(answer)
+    return ops, first, second, answers
+
+
+class QuestionPool:
+    def __init__(self, seed=None, tier='normal', batch_size=1024, prefetch=2, background=True):
+        if tier not in TIERS:
+            raise ValueError(f"Unknown tier {tier!r}")
+        self.seed = random.SystemRandom().randrange(1 << 32) if seed is None else seed
+        self.tier = tier
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self._rng = random.Random(self.seed)
+        self._batches = deque()
+        self._current = None
+        self._pos = 0
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._closed = False
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._refill, daemon=True)
+            self._thread.start()
+            self._wanted.set()
+
+    def _generate(self):
+        # Caller holds the lock, so batches are appended in the order the
+        # rng produced them whichever thread made them
+        self._batches.append(generate_batch(self._rng, TIERS[self.tier], self.batch_size))
+
+    def _refill(self):
+        while True:
+            self._wanted.wait()
+            self._wanted.clear()
+            while not self._closed:
+                with self._lock:
+                    if len(self._batches) >= self.prefetch:
+                        break
+                    self._generate()
+            if self._closed:
+                return
+
+    def next(self):
+        # (question text, answer)
+        with self._lock:
+            current, i = self._current, self._pos
+            if current is not None and i < len(current[0]):
+                self._pos = i + 1
+                return format_question(current[0][i], current[1][i], current[2][i]), current[3][i]
+        return self._take(1)[0]
+
+    def take(self, count):
+        # The next `count` questions, e.g. a worksheet for a class
+        return self._take(count)
+
+    def _take(self, count):
+        taken = []
+        with self._lock:
+            while len(taken) < count:
+                if self._current is None or self._pos >= len(self._current[0]):
+                    if not self._batches:
+                        self._generate()  # the refill thread fell behind
+                    self._current = self._batches.popleft()
+                    self._pos = 0
+                    if self._thread is not None:
+                        self._wanted.set()
+                ops, first, second, answers = self._current
+                end = min(len(ops), self._pos + count - len(taken))
+                for i in range(self._pos, end):
+                    taken.append((format_question(ops[i], first[i], second[i]), answers[i]))
+                self._pos = end
+        return taken
+
+    def replay(self):
+        # A fresh pool that will hand out the same questions from the start
+        return QuestionPool(self.seed, self.tier, self.batch_size, self.prefetch,
+                            self._thread is not None)
+
+    def close(self):
+        self._closed = True
+        self._wanted.set()
+
+
+class OperatorStats:
+    # Running (exponentially weighted) accuracy and answer time for one
+    # operator, and the difficulty level it has earned
+    __slots__ = ('accuracy', 'latency', 'level', 'count')
+
+    def __init__(self, level=0.3):
+        self.accuracy = 0.75
+        self.latency = None
+        self.level = level
+        self.count = 0
+
+    def update(self, correct, seconds=None):
+        self.count += 1
+        self.accuracy += EWMA_ALPHA * (correct - self.accuracy)
+        if seconds is not None:
+            self.latency = seconds if self.latency is None else \
+                self.latency + EWMA_ALPHA * (seconds - self.latency)
+        if not correct:
+            self.level = max(0.0, self.level - 2 * LEVEL_STEP)
+        elif seconds is None or seconds <= TARGET_SECONDS:
+            self.level = min(1.0, self.level + LEVEL_STEP)
+
+    def weight(self):
+        # Operators the player gets wrong, or answers slowly, come up more
+        slow = min(self.latency / TARGET_SECONDS, 2.0) if self.latency is not None else 1.0
+        return 0.5 + 2 * (1 - self.accuracy) + 0.5 * slow
+
+    def ranges(self, op):
+        # Operand ranges between the easy and hard tiers, by level
+        symbol = OPERATORS[op]
+        return tuple((round(lo + (hard_lo - lo) * self.level), round(hi + (hard_hi - hi) * self.level))
+                     for (lo, hi), (hard_lo, hard_hi) in zip(TIERS['easy'][symbol],
+                                                             TIERS['hard'][symbol]))
+
+
+def adaptive_question(rng, stats):
+    # (op, question text, answer) suited to the player's stats
+    weights = [s.weight() for s in stats]
+    pick = rng.random() * sum(weights)
+    op = 0
+    while op < len(weights) - 1 and pick >= weights[op]:
+        pick -= weights[op]
+        op += 1
+    (lo1, hi1), (lo2, hi2) = stats[op].ranges(op)
+    rand = rng.random
+    a, b, answer = make_question(op, lo1 + int(rand() * (hi1 - lo1 + 1)),
+                                 lo2 + int(rand() * (hi2 - lo2 + 1)))
+    return op, format_question(op, a, b), answer
+
+
+CORRECT_POINTS = 10
+WRONG_POINTS = 5
+
+
+def parse_answer(text):
+    # Answers are whole numbers, compared exactly ("42", "42.0" and "84/2"
+    # all count). Raises ValueError for input that is not a number.
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return Fraction(text.strip())
+        except ZeroDivisionError:
+            raise ValueError(f"Not a number: {text!r}")
+
+
+class Game:
+    # One player's Math Challenge: the current question, the score and the
+    # player's per-operator stats (which outlive individual games)
+    background = True  # refill the question pool in a thread
+
+    def __init__(self, tier='normal'):
+        if tier not in GAME_TIERS:
+            raise ValueError(f"Unknown tier {tier!r}")
+        self.tier = tier
+        self.questions = None  # QuestionPool, made on the first question
+        self.rng = None        # random.Random for the adaptive tier
+        self.stats = [OperatorStats() for _ in OPERATORS]
+        self.score = 0
+        self.question = None
+        self.answer = None
+        self.op = None
+        self.asked_at = None
+        self.last_time = None  # seconds the last checked answer took
+
+    @property
+    def seed(self):
+        if self.tier == ADAPTIVE:
+            return None if self.rng is None else self._seed
+        return None if self.questions is None else self.questions.seed
+
+    def new_game(self, seed=None, tier=None):
+        # Start a fresh question sequence; the same seed and tier replay it
+        if tier is not None:
+            if tier not in GAME_TIERS:
+                raise ValueError(f"Unknown tier {tier!r}")
+            self.tier = tier
+        if self.questions is not None:
+            self.questions.close()
+            self.questions = None
+        self.rng = None
+        if self.tier == ADAPTIVE:
+            self._start_adaptive(seed)
+        else:
+            self.questions = QuestionPool(seed, self.tier, background=self.background)
+        self.reset_game()
+        return self.seed
+
+    def _start_adaptive(self, seed=None):
+        self._seed = random.SystemRandom().randrange(1 << 32) if seed is None else seed
+        self.rng = random.Random(self._seed)
+
+    def generate_question(self):
+        if self.tier == ADAPTIVE:
+            if self.rng is None:
+                self._start_adaptive()
+            self.op, self.question, self.answer = adaptive_question(self.rng, self.stats)
+        else:
+            if self.questions is None:
+                self.questions = QuestionPool(tier=self.tier, background=self.background)
+            self.question, self.answer = self.questions.next()
+            self.op = None
+        self.asked_at = time.monotonic()
+        return self.question
+
+    def check_answer(self, text):
+        user_answer = parse_answer(text)
+        if self.answer is None:
+            raise ValueError("No question asked yet")
+        correct = user_answer == self.answer
+        # Only the first answer to a question is timed and counted
+        self.last_time = None
+        if self.asked_at is not None:
+            self.last_time = time.monotonic() - self.asked_at
+            self.asked_at = None
+            op = self.op if self.op is not None else OPERATORS.index(self.question.split()[1])
+            self.stats[op].update(correct, self.last_time)
+        if correct:
+            self.score += CORRECT_POINTS
+        else:
+            self.score = max(0, self.score - WRONG_POINTS)
+        return correct
+
+    def reset_game(self):
+        self.score = 0
+        self.question = None
+        self.answer = None
+        self.op = None
+        self.asked_at = None
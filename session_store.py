@@ -0,0 +1,213 @@
+import os
+import struct
+from decimal import Decimal
+from fractions import Fraction
+
+# Session state (expression, memory registers, theme, mode, ...) as a compact
+# binary log. Every change appends one small record, so saving costs a few
+# bytes rather than a rewrite; on startup the records are replayed in order,
+# the last one for a key winning. When the log has grown well past the size
+# of the live state it is rewritten as a fresh snapshot, which bounds how much
+# has to be read at startup however long the calculator has been in use.
+# Large state (the history) is not in here: it stays in its own file and is
+# only read when first needed.
+#
+# File: MAGIC, then records of
+#   op (1 byte: SET or DELETE), key (varint length + UTF-8),
+#   and for SET: type (1 byte), value (varint length + bytes)
+# A record cut short by a crash is ignored.
+
+MAGIC = b'UCS1'
+SET, DELETE = 1, 2
+COMPACT_RATIO = 8       # rewrite once the log is this many times the live state
+COMPACT_MIN = 64 * 1024
+
+_MISSING = object()
+
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7f
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def encode_value(value):
+    # (type byte, payload)
+    if value is None:
+        return b'n', b''
+    if isinstance(value, bool):
+        return b'b', b'\x01' if value else b'\x00'
+    if isinstance(value, int):
+        return b'i', str(value).encode()
+    if isinstance(value, float):
+        return b'f', struct.pack('<d', value)
+    if isinstance(value, Fraction):
+        return b'q', str(value).encode()
+    if isinstance(value, Decimal):
+        return b'd', str(value).encode()
+    if isinstance(value, str):
+        return b's', value.encode('utf-8')
+    raise TypeError(f"Can't store {type(value).__name__} values")
+
+
+def decode_value(kind, payload):
+    if kind == b'n':
+        return None
+    if kind == b'b':
+        return payload == b'\x01'
+    if kind == b'i':
+        return int(payload)
+    if kind == b'f':
+        return struct.unpack('<d', payload)[0]
+    if kind == b'q':
+        return Fraction(payload.decode())
+    if kind == b'd':
+        return Decimal(payload.decode())
+    if kind == b's':
+        return payload.decode('utf-8')
+    raise ValueError(f"Unknown value type {kind!r}")
+
+
+def encode_record(key, value=_MISSING):
+    key = key.encode('utf-8')
+    if value is _MISSING:
+        return bytes((DELETE,)) + _varint(len(key)) + key
+    kind, payload = encode_value(value)
+    return bytes((SET,)) + _varint(len(key)) + key + kind + _varint(len(payload)) + payload
+
+
+def decode_records(data):
+    # Replay a log: ({key: value}, bytes of it that were valid)
+    state = {}
+    if not data.startswith(MAGIC):
+        return state, 0
+    good, end = len(MAGIC), len(data)
+    while good < end:
+        try:
+            op = data[good]
+            size, pos = _read_varint(data, good + 1)
+            if pos + size > end:
+                break
+            key = data[pos:pos + size].decode('utf-8')
+            pos += size
+            if op == DELETE:
+                state.pop(key, None)
+            elif op == SET:
+                kind = data[pos:pos + 1]
+                size, pos = _read_varint(data, pos + 1)
+                if pos + size > end:
+                    break
+                state[key] = decode_value(kind, data[pos:pos + size])
+                pos += size
+            else:
+                break
+        except (IndexError, ValueError, ArithmeticError, struct.error):
+            # Torn or corrupt tail (a short float, a Fraction of 1/0, ...):
+            # keep what was read so far
+            break
+        good = pos
+    return state, good
+
+
+class SessionStore:
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+        self._file = None
+        self._size = 0       # bytes in the log
+        self._live = 0       # bytes a fresh snapshot would take
+        self._clean = False  # the file on disk can be appended to as is
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+        self.state, valid = decode_records(data)
+        self._size = valid
+        self._clean = valid > 0 and valid == len(data)
+        self._live = len(MAGIC) + sum(len(encode_record(k, v)) for k, v in self.state.items())
+        return dict(self.state)
+
+    def get(self, key, default=None):
+        return self.state.get(key, default)
+
+    def set(self, key, value):
+        old = self.state.get(key, _MISSING)
+        if old is not _MISSING and type(old) is type(value) and old == value:
+            return
+        record = encode_record(key, value)
+        self.state[key] = value
+        self._live += len(record) - (len(encode_record(key, old)) if old is not _MISSING else 0)
+        self._append(record)
+
+    def update(self, values):
+        for key, value in values.items():
+            self.set(key, value)
+
+    def replace(self, values):
+        # Make the stored state exactly `values`, writing only what differs
+        for key in [key for key in self.state if key not in values]:
+            self.delete(key)
+        self.update(values)
+
+    def delete(self, key):
+        old = self.state.pop(key, _MISSING)
+        if old is _MISSING:
+            return
+        self._live -= len(encode_record(key, old))
+        self._append(encode_record(key))
+
+    def _append(self, record):
+        # self.state already holds the change
+        if self._file is None:
+            if not self._clean:
+                # No file yet, or a damaged one: start over from a snapshot
+                self._write_snapshot()
+                self._file = open(self.path, 'ab')
+                return
+            self._file = open(self.path, 'ab')
+        self._file.write(record)
+        self._file.flush()
+        self._size += len(record)
+        if self._size > max(COMPACT_MIN, COMPACT_RATIO * self._live):
+            self.compact()
+
+    def _write_snapshot(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = MAGIC + b''.join(encode_record(k, v) for k, v in self.state.items())
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+        self._size = self._live = len(data)
+        self._clean = True
+
+    def compact(self):
+        self.close()
+        self._write_snapshot()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,539 @@
+import math
+import weakref
+from collections import OrderedDict
+from decimal import Context, Decimal, localcontext
+from fractions import Fraction
+from functools import lru_cache
+
+from expression import (MAX_RESULT_BITS, ExpressionError, _fraction_sqrt, _Parser, _power,
+                        balance_parens, format_result, function_table, normalize_result,
+                        tokenize)
+
+# Symbolic mode: expressions kept as a DAG instead of being compiled straight
+# to numbers, so they can be simplified and differentiated.
+#
+# Nodes are hash-consed: building an operator over the same operands always
+# returns the same Node, so a subexpression that appears twice is stored (and
+# evaluated) once, and re-parsing a formula after editing one term gives back
+# the very same nodes for every term that didn't change. Each node remembers
+# its last value, keyed by the angle mode, backend and the values of the
+# variables below it; re-evaluating an edited formula only computes the new
+# term and the path from it to the root. The top-level terms of a formula
+# (the parts joined by + and -) are also cached by their tokens, so an edit
+# doesn't re-parse the terms around it either.
+#
+# Simplification happens as nodes are built: constants are folded exactly
+# (literals are Fractions, so 0.1+0.2 is 3/10), and identities such as x+0,
+# x*1, x-x, x/x, x*x -> x**2 and --x are applied locally.
+#
+#   s = Symbolic()
+#   f = s.parse('x**3 + sin(x)')
+#   s.to_text(s.derivative(f, 'x', is_degree=False))   # '3*x**2 + cos(x)'
+#   s.evaluate(f, {'x': 2})
+#
+# Every walk over the DAG uses an explicit stack, so long pasted formulas
+# don't hit the recursion limit.
+
+DEGREE = math.pi / 180  # d/dx sin(x°) = cos(x°) * pi/180
+
+# Function values that are exact, so calls on these constants can be folded
+EXACT_CALLS = {
+    ('sin', 0): 0, ('cos', 0): 1, ('tan', 0): 0,
+    ('asin', 0): 0, ('atan', 0): 0, ('log', 1): 0, ('log10', 1): 0,
+}
+
+# Binding strength when printing; higher binds tighter
+_PREC = {'+': 1, '-': 1, '*': 2, '/': 2, '//': 2, '%': 2, 'neg': 3, '**': 4}
+_ATOM = 5
+
+
+class Node:
+    # op: 'num', 'var', 'neg', 'call', or a binary operator ('+', '**', ...)
+    # value: the number, variable name or function name
+    # free: sorted tuple of the variables the node depends on
+    # memo: (context, variable values, result) of the last evaluation
+    __slots__ = ('op', 'value', 'args', 'free', 'memo', '__weakref__')
+
+    def __init__(self, op, value, args, free):
+        self.op = op
+        self.value = value
+        self.args = args
+        self.free = free
+        self.memo = None
+
+    def __repr__(self):
+        return f"<Node {self.op} {self.value!r}>" if self.value is not None else f"<Node {self.op}>"
+
+
+def _exact(value):
+    return isinstance(value, (int, Fraction))
+
+
+def _number(value):
+    if isinstance(value, Fraction) and value.denominator == 1:
+        return value.numerator
+    return value
+
+
+@lru_cache(maxsize=1024)
+def _literal(text):
+    return _number(Fraction(text))
+
+
+def _walk(root, visit, descend=None):
+    # Post-order over the DAG, every node once: visit(node, child results).
+    # descend(node) can return False to visit a node without its children.
+    results = {}
+    stack = [(root, False)]
+    while stack:
+        node, ready = stack.pop()
+        if node in results:
+            continue
+        if not ready and node.args and (descend is None or descend(node)):
+            stack.append((node, True))
+            stack.extend((arg, False) for arg in node.args if arg not in results)
+            continue
+        results[node] = visit(node, [results[arg] for arg in node.args]
+                              if ready else None)
+    return results[root]
+
+
+class Symbolic:
+    def __init__(self, max_bits=MAX_RESULT_BITS, max_terms=1024):
+        self.max_bits = max_bits
+        self.max_terms = max_terms
+        self.hits = 0          # nodes requested that already existed
+        self.computed = 0      # nodes evaluate() actually had to compute
+        self._nodes = weakref.WeakValueDictionary()
+        # LRU of parsed top-level terms: tokens -> node. It also keeps the
+        # recent formulas' nodes (and memoized values) alive for the next edit.
+        self._terms = OrderedDict()
+
+    def __len__(self):
+        return len(self._nodes)
+
+    #  BUILDING
+    def _intern(self, op, value, args=()):
+        key = (op, type(value).__name__, value, args)
+        node = self._nodes.get(key)
+        if node is not None:
+            self.hits += 1
+            return node
+        if op == 'var':
+            free = (value,)
+        elif len(args) == 1:
+            free = args[0].free
+        elif args:
+            free = tuple(sorted(set(args[0].free).union(args[1].free)))
+        else:
+            free = ()
+        node = Node(op, value, args, free)
+        self._nodes[key] = node
+        return node
+
+    def num(self, value):
+        if isinstance(value, bool):
+            value = int(value)
+        return self._intern('num', _number(value))
+
+    def var(self, name):
+        return self._intern('var', name)
+
+    def neg(self, a):
+        if a.op == 'num':
+            return self.num(-a.value)
+        if a.op == 'neg':
+            return a.args[0]
+        if a.op == '-':
+            return self.binary('-', a.args[1], a.args[0])
+        return self._intern('neg', None, (a,))
+
+    def call(self, name, a):
+        if name == 'ln':
+            name = 'log'  # the same function; one node for both spellings
+        if a.op == 'num':
+            value = a.value
+            if (name, value) in EXACT_CALLS:
+                return self.num(EXACT_CALLS[name, value])
+            if name == 'abs':
+                return self.num(abs(value))
+            if name == 'sqrt' and _exact(value) and value >= 0:
+                root = _fraction_sqrt(value)
+                if _exact(root):
+                    return self.num(root)
+            if name == 'factorial' and isinstance(value, int) and 0 <= value <= 20:
+                return self.num(math.factorial(value))
+            if isinstance(value, float) and name in ('sqrt', 'log', 'log10'):
+                # Already inexact, and the same in DEG and RAD: nothing to keep
+                return self.num(function_table()[name](value))
+        return self._intern('call', name, (a,))
+
+    def _fold(self, op, a, b):
+        if op == '**':
+            if _exact(a) and isinstance(b, int) and b < 0:
+                a = Fraction(a)  # 2**-1 is 1/2, not 0.5
+            return _power(a, b, self.max_bits)
+        if op == '/':
+            return Fraction(a) / b if _exact(a) and _exact(b) else a / b
+        if op == '+':
+            return a + b
+        if op == '-':
+            return a - b
+        if op == '*':
+            return a * b
+        if op == '//':
+            return a // b
+        return a % b
+
+    def binary(self, op, a, b):
+        if a.op == 'num' and b.op == 'num':
+            if op == '**' and _exact(a.value) and isinstance(b.value, Fraction):
+                pass  # a root: keep it exact, as a node
+            else:
+                return self.num(self._fold(op, a.value, b.value))
+        zero_a = a.op == 'num' and a.value == 0
+        zero_b = b.op == 'num' and b.value == 0
+        one_a = a.op == 'num' and a.value == 1
+        one_b = b.op == 'num' and b.value == 1
+        if op == '+':
+            if zero_a:
+                return b
+            if zero_b:
+                return a
+            if a.op == 'num':  # constants go last: x + 2
+                a, b = b, a
+            if b.op == 'neg':
+                return self.binary('-', a, b.args[0])
+            if b.op == 'num' and b.value < 0:
+                return self.binary('-', a, self.num(-b.value))
+            if a is b:
+                return self.binary('*', self.num(2), a)
+            if b.op == 'num' and a.op in ('+', '-') and a.args[1].op == 'num':
+                # (x + 1) + 2 -> x + 3, (x - 1) + 2 -> x - -1 -> x + 1
+                return self.binary(a.op, a.args[0], self.binary(a.op, a.args[1], b))
+        elif op == '-':
+            if zero_b:
+                return a
+            if zero_a:
+                return self.neg(b)
+            if a is b:
+                return self.num(0)
+            if b.op == 'neg':
+                return self.binary('+', a, b.args[0])
+            if b.op == 'num' and b.value < 0:
+                return self.binary('+', a, self.num(-b.value))
+            if b.op == 'num' and a.op in ('+', '-') and a.args[1].op == 'num':
+                # (x + 3) - 1 -> x + 2
+                return self.binary(a.op, a.args[0], self.binary(
+                    '-' if a.op == '+' else '+', a.args[1], b))
+        elif op == '*':
+            if zero_a or zero_b:
+                return self.num(0)
+            if one_a:
+                return b
+            if one_b:
+                return a
+            if b.op == 'num':  # constants go first: 2*x
+                a, b = b, a
+            if a.op == 'num' and a.value == -1:
+                return self.neg(b)
+            if a.op == 'num' and b.op == '*' and b.args[0].op == 'num':
+                # 2*(3*x) -> 6*x
+                return self.binary('*', self.binary('*', a, b.args[0]), b.args[1])
+            if a.op == 'num' and b.op == '/' and b.args[0].op == 'num':
+                # 2*(3/x) -> 6/x
+                return self.binary('/', self.binary('*', a, b.args[0]), b.args[1])
+            if b.op == '/' and b.args[0].op == 'num' and b.args[0].value == 1:
+                return self.binary('/', a, b.args[1])  # x*(1/y) -> x/y
+            if a.op == '/' and a.args[0].op == 'num' and a.args[0].value == 1:
+                return self.binary('/', b, a.args[1])
+            if a.op == 'neg' and b.op == 'neg':
+                return self.binary('*', a.args[0], b.args[0])  # (-x)*(-y) -> x*y
+            if a.op == 'neg' or b.op == 'neg':
+                return self.neg(self.binary('*', a.args[0] if a.op == 'neg' else a,
+                                            b.args[0] if b.op == 'neg' else b))
+            base_a, exp_a = (a.args[0], a.args[1]) if a.op == '**' else (a, None)
+            base_b, exp_b = (b.args[0], b.args[1]) if b.op == '**' else (b, None)
+            if base_a is base_b:
+                # x*x -> x**2, x**2*x -> x**3, x**a*x**b -> x**(a+b)
+                return self.binary('**', base_a, self.binary(
+                    '+', exp_a or self.num(1), exp_b or self.num(1)))
+        elif op == '/':
+            if zero_b:
+                raise ZeroDivisionError("division by zero")
+            if one_b:
+                return a
+            if zero_a:
+                return self.num(0)
+            if a is b:
+                return self.num(1)
+            if a.op == 'neg' and b.op == 'neg':
+                return self.binary('/', a.args[0], b.args[0])
+            if a.op == 'neg':
+                return self.neg(self.binary('/', a.args[0], b))
+            if b.op == '**' and b.args[0] is a and b.args[1].op == 'num':
+                # x/x**3 -> 1/x**2
+                return self.binary('/', self.num(1), self.binary(
+                    '**', a, self.num(b.args[1].value - 1)))
+            if a.op == '**' and a.args[0] is b:
+                # x**3/x -> x**2
+                return self.binary('**', b, self.binary('-', a.args[1], self.num(1)))
+        elif op == '**':
+            if zero_b:
+                return self.num(1)
+            if one_b or one_a:
+                return a
+            if (a.op == '**' and b.op == 'num' and a.args[1].op == 'num'
+                    and isinstance(b.value, int) and isinstance(a.args[1].value, int)):
+                # (x**2)**3 -> x**6; only for whole exponents, where it always holds
+                return self.binary('**', a.args[0], self.num(a.args[1].value * b.value))
+        return self._intern(op, None, (a, b))
+
+    def parse(self, text):
+        # Text (the calculator's expression syntax) -> simplified DAG
+        tokens = tokenize(balance_parens(text))
+        if not tokens:
+            raise ExpressionError("Empty expression")
+        # Split at the + and - that join top-level terms (not unary signs)
+        parts, ops, start, depth = [], [], 0, 0
+        for i, (kind, value) in enumerate(tokens):
+            if value == '(':
+                depth += 1
+            elif value == ')':
+                depth -= 1
+            elif (depth == 0 and kind == 'op' and value in ('+', '-') and i > start
+                    and (tokens[i - 1][0] != 'op' or tokens[i - 1][1] == ')')):
+                parts.append(tuple(tokens[start:i]))
+                ops.append(value)
+                start = i + 1
+        parts.append(tuple(tokens[start:]))
+        root = self._term(parts[0])
+        for op, part in zip(ops, parts[1:]):
+            root = self.binary(op, root, self._term(part))
+        return root
+
+    def _term(self, tokens):
+        terms = self._terms
+        node = terms.get(tokens)
+        if node is not None:
+            terms.move_to_end(tokens)
+            return node
+        try:
+            node = self._build(_Parser(list(tokens)).parse())
+        except RecursionError:
+            raise ExpressionError("Expression nested too deeply")
+        terms[tokens] = node
+        while len(terms) > self.max_terms:
+            terms.popitem(last=False)
+        return node
+
+    def _build(self, item):
+        kind = item[0]
+        if kind == 'num':
+            return self.num(_literal(item[2]))
+        if kind == 'var':
+            return self.var(item[1])
+        if kind == 'neg':
+            return self.neg(self._build(item[1]))
+        if kind == 'pos':
+            return self._build(item[1])
+        if kind == 'call':
+            return self.call(item[1], self._build(item[2]))
+        if item[1] == '**':
+            return self.binary('**', self._build(item[2]), self._build(item[3]))
+        # Long left-leaning chains like 1+2+3+... are built in a loop so that
+        # pasted expressions do not hit the recursion limit
+        chain = []
+        while item[0] == 'bin' and item[1] != '**':
+            chain.append((item[1], item[3]))
+            item = item[2]
+        node = self._build(item)
+        for op, right in reversed(chain):
+            node = self.binary(op, node, self._build(right))
+        return node
+
+    #  DIFFERENTIATION
+    def derivative(self, root, variable='x', is_degree=True):
+        # d(root)/d(variable), simplified. In DEG mode the trig functions take
+        # and give degrees, which brings in the pi/180 chain factor.
+        k = self.num(DEGREE) if is_degree else None
+
+        def scaled(node):
+            return node if k is None else self.binary('*', k, node)
+
+        def unscaled(node):
+            return node if k is None else self.binary('*', self.num(1 / DEGREE), node)
+
+        def visit(node, d):
+            if d is None:
+                return self.num(1 if node.op == 'var' and node.value == variable else 0)
+            op, args = node.op, node.args
+            if op == 'neg':
+                return self.neg(d[0])
+            if op == '+' or op == '-':
+                return self.binary(op, d[0], d[1])
+            if op == '*':
+                a, b = args
+                return self.binary('+', self.binary('*', d[0], b), self.binary('*', a, d[1]))
+            if op == '/':
+                a, b = args
+                return self.binary('/', self.binary('-', self.binary('*', d[0], b),
+                                                    self.binary('*', a, d[1])),
+                                   self.binary('**', b, self.num(2)))
+            if op == '**':
+                a, b = args
+                if variable not in b.free:
+                    # b * a**(b-1) * a'
+                    return self.binary('*', self.binary('*', b, self.binary(
+                        '**', a, self.binary('-', b, self.num(1)))), d[0])
+                # a**b * (b'*ln(a) + b*a'/a)
+                return self.binary('*', node, self.binary(
+                    '+', self.binary('*', d[1], self.call('log', a)),
+                    self.binary('/', self.binary('*', b, d[0]), a)))
+            if op == '%':
+                if variable in args[1].free:
+                    raise ExpressionError("Can't differentiate % by a varying amount")
+                return d[0]
+            if op == '//':
+                if variable in args[1].free:
+                    raise ExpressionError("Can't differentiate // by a varying amount")
+                return self.num(0)
+            # op == 'call'
+            name, u, du = node.value, args[0], d[0]
+            one = self.num(1)
+            if name == 'sin':
+                inner = scaled(self.call('cos', u))
+            elif name == 'cos':
+                inner = self.neg(scaled(self.call('sin', u)))
+            elif name == 'tan':
+                inner = self.binary('/', scaled(one), self.binary('**', self.call('cos', u),
+                                                                  self.num(2)))
+            elif name in ('asin', 'acos'):
+                inner = unscaled(self.binary('/', one, self.call('sqrt', self.binary(
+                    '-', one, self.binary('**', u, self.num(2))))))
+                if name == 'acos':
+                    inner = self.neg(inner)
+            elif name == 'atan':
+                inner = unscaled(self.binary('/', one, self.binary(
+                    '+', one, self.binary('**', u, self.num(2)))))
+            elif name == 'sqrt':
+                inner = self.binary('/', one, self.binary('*', self.num(2), node))
+            elif name == 'log':
+                inner = self.binary('/', one, u)
+            elif name == 'log10':
+                inner = self.binary('/', one, self.binary('*', u, self.call('log', self.num(10))))
+            elif name == 'abs':
+                inner = self.binary('/', u, node)
+            else:
+                raise ExpressionError(f"Can't differentiate {name}()")
+            return self.binary('*', inner, du)
+
+        # Subtrees without the variable are constants: don't walk into them
+        return _walk(root, lambda node, d: self.num(0) if variable not in node.free
+                     else visit(node, d), lambda node: variable in node.free)
+
+    #  EVALUATION
+    def evaluate(self, root, values=None, is_degree=True, backend='float', precision=28):
+        # Numeric value of the DAG, given {variable: value}. Nodes whose
+        # inputs haven't changed since they were last evaluated (in the same
+        # mode) return their memoized value without looking at their children.
+        values = values or {}
+        funcs = function_table(is_degree, backend, self.max_bits)
+        pow_ = funcs['**']
+        mod_ = funcs.get('%')  # the decimal backend's, which raises for x % 0
+        context = (is_degree, backend, precision)
+
+        def inputs(node):
+            try:
+                return tuple((type(values[name]), values[name]) for name in node.free)
+            except KeyError as e:
+                raise ExpressionError(f"Unknown name {e.args[0]!r}")
+
+        def current(node):
+            memo = node.memo
+            return memo is None or memo[0] != context or memo[1] != inputs(node)
+
+        def visit(node, args):
+            memo = node.memo
+            key = inputs(node)
+            if memo is not None and memo[0] == context and memo[1] == key:
+                return memo[2]
+            self.computed += 1
+            op = node.op
+            if op == 'num':
+                value = self._constant(node.value, backend)
+            elif op == 'var':
+                value = values[node.value]
+            elif op == 'neg':
+                value = -args[0]
+            elif op == 'call':
+                value = funcs[node.value](args[0])
+            elif op == '**':
+                value = pow_(args[0], args[1])
+            elif op == '%' and mod_ is not None:
+                value = mod_(args[0], args[1])
+            else:
+                value = self._apply(op, args[0], args[1])
+            node.memo = (context, key, value)
+            return value
+
+        if backend == 'decimal':
+            with localcontext(Context(prec=precision)):
+                return normalize_result(_walk(root, visit, current))
+        return normalize_result(_walk(root, visit, current))
+
+    @staticmethod
+    def _constant(value, backend):
+        if backend == 'decimal':
+            if isinstance(value, Fraction):
+                return Decimal(value.numerator) / value.denominator
+            return Decimal(value) if isinstance(value, int) else Decimal(repr(value))
+        if backend == 'float' and isinstance(value, Fraction):
+            return float(value)
+        return value
+
+    @staticmethod
+    def _apply(op, a, b):
+        if op == '+':
+            return a + b
+        if op == '-':
+            return a - b
+        if op == '*':
+            return a * b
+        if op == '/':
+            return a / b
+        if op == '//':
+            return a // b
+        return a % b
+
+    #  PRINTING
+    def to_text(self, root, precision=28):
+        # Back to the calculator's syntax (so the result can be evaluated or
+        # differentiated again), with only the parentheses that are needed
+
+        def wrap(item, tighter_than):
+            text, prec = item
+            return f"({text})" if prec <= tighter_than else text
+
+        def visit(node, args):
+            op = node.op
+            if op == 'num':
+                value = node.value
+                text = format_result(value, precision) if _exact(value) else repr(value)
+                if text.startswith('-'):
+                    return text, _PREC['neg']
+                return text, (_PREC['/'] if '/' in text else _ATOM)
+            if op == 'var':
+                return node.value, _ATOM
+            if op == 'call':
+                return f"{node.value}({args[0][0]})", _ATOM
+            if op == 'neg':
+                return '-' + wrap(args[0], _PREC['neg']), _PREC['neg']
+            prec = _PREC[op]
+            if op == '**':
+                # Right-associative, and its right side may be a bare -x
+                return f"{wrap(args[0], prec)}**{wrap(args[1], _PREC['neg'] - 1)}", prec
+            sep = f" {op} " if prec == 1 else op
+            return wrap(args[0], prec - 1) + sep + wrap(args[1], prec), prec
+
+        return _walk(root, visit)[0]
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from questions import (EWMA_ALPHA, LEVEL_STEP, OPERATORS, TARGET_SECONDS, TIERS, Game,
+                       OperatorStats, adaptive_question)
+
+
+def test_running_estimates():
+    stats = OperatorStats()
+    stats.update(True, 4.0)
+    assert stats.accuracy == pytest.approx(0.75 + EWMA_ALPHA * 0.25)
+    assert stats.latency == 4.0
+    stats.update(False, 9.0)
+    assert stats.accuracy == pytest.approx(0.8 * (1 - EWMA_ALPHA))
+    assert stats.latency == pytest.approx(4.0 + EWMA_ALPHA * 5.0)
+    assert stats.count == 2
+
+
+def test_level_changes():
+    stats = OperatorStats(level=0.5)
+    stats.update(True, TARGET_SECONDS)
+    assert stats.level == pytest.approx(0.5 + LEVEL_STEP)
+    stats.update(True, TARGET_SECONDS + 1)  # right but slow: no change
+    assert stats.level == pytest.approx(0.5 + LEVEL_STEP)
+    stats.update(False, 1.0)                # wrong: down twice as fast
+    assert stats.level == pytest.approx(0.5 - LEVEL_STEP)
+    for _ in range(100):
+        stats.update(True)
+    assert stats.level == 1.0
+    for _ in range(100):
+        stats.update(False)
+    assert stats.level == 0.0
+
+
+def test_ranges_follow_the_level():
+    stats = OperatorStats(level=0.0)
+    assert stats.ranges(2) == TIERS['easy']['×']
+    stats.level = 1.0
+    assert stats.ranges(2) == TIERS['hard']['×']
+
+
+def test_weak_operators_come_up_more():
+    stats = [OperatorStats() for _ in OPERATORS]
+    for _ in range(20):
+        stats[3].update(False, 15.0)
+        stats[0].update(True, 2.0)
+    assert stats[3].weight() > stats[1].weight() > stats[0].weight()
+    rng = random.Random(3)
+    ops = [adaptive_question(rng, stats)[0] for _ in range(2000)]
+    assert ops.count(3) > 2 * ops.count(0)
+
+
+def test_adaptive_game_levels_up():
+    game = Game('adaptive')
+    game.new_game(seed=11)
+    for _ in range(30):
+        game.generate_question()
+        assert game.check_answer(str(game.answer))
+    assert all(s.level > 0.3 for s in game.stats if s.count)
+    assert sum(s.count for s in game.stats) == 30
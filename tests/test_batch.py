@@ -0,0 +1,14 @@
+import pytest
+
+from batch import evaluate_many
+
+
+def test_large_integers_stay_exact():
+    values = [2**53 + 1, 2**60 + 3, -(2**61) - 5, 3]
+    assert evaluate_many('x % 7', values) == [v % 7 for v in values]
+
+
+def test_ndarray_int64_extremes():
+    np = pytest.importorskip('numpy')
+    values = np.array([np.iinfo(np.int64).min, 2**53 + 1, 10], dtype=np.int64)
+    assert evaluate_many('x % 7', values) == [int(v) % 7 for v in values.tolist()]
@@ -0,0 +1,53 @@
+import io
+
+import pytest
+
+from calc_cli import run
+from calc_server import evaluate_batch, parse_request
+from calculator_core import CalculatorCore, evaluate_text
+
+LINES = ['2+3', 'sin(30)', '', '1/0', 'bad(', '1/3', '9**9**9', 'factorial(20)']
+
+
+def gui_text(expression):
+    # What the display shows after typing the expression and "="
+    core = CalculatorCore()
+    core.expression = expression
+    try:
+        core.calculate()
+    except Exception as e:
+        return False, str(e)
+    return True, core.display
+
+
+@pytest.mark.parametrize('expression', [line for line in LINES if line])
+def test_cli_server_and_gui_agree(expression):
+    expected = gui_text(expression)
+    assert evaluate_text(expression) == expected
+    assert evaluate_batch([(expression, True, 'float', 28)]) == [expected]
+    out = io.StringIO()
+    run([expression + '\n'], out)
+    ok, text = expected
+    assert out.getvalue() == (text if ok else f"Error: {text}") + "\n"
+
+
+def test_one_output_line_per_input_line():
+    out = io.StringIO()
+    run([line + '\n' for line in LINES], out)
+    assert out.getvalue().split('\n')[:-1] == [
+        '5', '0.5', '', 'Error: Cannot divide by zero', 'Error: Invalid expression',
+        '0.3333333333', 'Error: Result too large', '2432902008176640000']
+
+
+def test_parallel_run_keeps_the_order():
+    lines = [f'{i}*{i}\n' for i in range(300)]
+    serial, parallel = io.StringIO(), io.StringIO()
+    run(lines, serial)
+    run(lines, parallel, jobs=2, chunk_size=50)
+    assert parallel.getvalue() == serial.getvalue()
+
+
+def test_parse_request():
+    assert parse_request('{"id": 1, "expr": "2+2", "rad": true}') == (1, ('2+2', False, 'float', 28))
+    assert parse_request('{"id": 2, "expr": "1", "mode": "complex"}') == (2, "Unknown mode 'complex'")
+    assert parse_request('not json') == (None, "Bad request")
@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+import pytest
+
+from calculator_core import CalculationError, calculate_text
+from expression import ExpressionCache
+
+
+def evaluate(text, is_degree=True):
+    return calculate_text(ExpressionCache(0), text, is_degree, 'decimal')[1]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('cos(90)', 0), ('sin(180)', 0), ('sin(270)', -1), ('cos(-180)', -1),
+    ('sin(450)', 1), ('tan(180)', 0), ('sin(0)', 0),
+])
+def test_multiples_of_90_degrees_are_exact(text, expected):
+    assert evaluate(text) == Decimal(expected)
+
+
+def test_other_angles_still_use_the_series():
+    assert evaluate('cos(60)') == Decimal('0.5')
+    assert evaluate('sin(90)', is_degree=False) == evaluate('sin(90.0)', is_degree=False)
+
+
+@pytest.mark.parametrize('text, message', [
+    ('10%0', "Cannot divide by zero"),
+    ('1/0', "Cannot divide by zero"),
+    ('0**-1', "Cannot divide by zero"),
+    ('tan(90)', "Cannot divide by zero"),
+    ('9**9**9', "Result too large"),
+    ('log(0)', "Invalid expression"),
+    ('log10(0)', "Invalid expression"),
+    ('sqrt(-1)', "Invalid expression"),
+])
+def test_errors_match_the_float_backend(text, message):
+    with pytest.raises(CalculationError, match=message):
+        evaluate(text)
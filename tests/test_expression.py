@@ -0,0 +1,43 @@
+import math
+
+import pytest
+
+from expression import ExpressionError, balance_parens, evaluate
+
+
+def deg(f):
+    return lambda v: f(math.radians(v))
+
+
+@pytest.mark.parametrize('text, is_degree, expected', [
+    ('sin(cos(30))', True, deg(math.sin)(deg(math.cos)(30))),
+    ('sin(cos(30))', False, math.sin(math.cos(30))),
+    ('cos(sin(90))', True, deg(math.cos)(1)),
+    ('tan(atan(1))', True, 1),
+    ('asin(sin(30))', True, 30),
+    ('acos(cos(60))', True, 60),
+    ('sqrt(abs(-16))+log10(100)', True, 6),
+])
+def test_nested_functions(text, is_degree, expected):
+    assert evaluate(text, is_degree) == pytest.approx(expected, abs=1e-10)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('2+3*4', 14), ('(2+3)*4', 20), ('2**3**2', 512), ('-2**2', -4),
+    ('10%4', 2), ('.5+.5', 1), ('1e3', 1000), ('factorial(5)/5', 24),
+])
+def test_operators(text, expected):
+    assert evaluate(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    '__import__("os")', '().__class__', 'foo(1)', 'x+1', '1+', '2**', '3!',
+])
+def test_rejects_anything_else(text):
+    with pytest.raises(ExpressionError):
+        evaluate(text)
+
+
+def test_balance_parens():
+    assert balance_parens('sin(cos(30') == 'sin(cos(30))'
+    assert evaluate(balance_parens('sin(cos(30'), True) == evaluate('sin(cos(30))', True)
@@ -0,0 +1,44 @@
+from expression import ExpressionCache
+
+
+def test_hits_and_misses():
+    cache = ExpressionCache(4)
+    assert cache.evaluate('1+1') == 2
+    assert cache.evaluate('1+1') == 2
+    assert cache.evaluate('sin(30)') == 0.5
+    assert cache.info() == {'hits': 1, 'misses': 2, 'evictions': 0, 'size': 2, 'maxsize': 4}
+
+
+def test_angle_mode_and_backend_are_part_of_the_key():
+    cache = ExpressionCache(8)
+    assert cache.get('sin(30)', True) is not cache.get('sin(30)', False)
+    assert cache.get('1/3', backend='float') is not cache.get('1/3', backend='fraction')
+    assert cache.get('1/3', backend='decimal', precision=10) is not \
+        cache.get('1/3', backend='decimal', precision=20)
+    # precision only matters to the decimal backend
+    assert cache.get('1/3', precision=10) is cache.get('1/3', precision=20)
+
+
+def test_least_recently_used_is_evicted():
+    cache = ExpressionCache(2)
+    a = cache.get('1+1')
+    cache.get('2+2')
+    assert cache.get('1+1') is a   # now the most recently used
+    cache.get('3+3')               # evicts 2+2
+    assert cache.evictions == 1 and len(cache) == 2
+    assert cache.get('1+1') is a
+    misses = cache.misses
+    cache.get('2+2')
+    assert cache.misses == misses + 1
+
+
+def test_resize_and_disabled_cache():
+    cache = ExpressionCache(3)
+    for text in ('1', '2', '3'):
+        cache.get(text)
+    cache.resize(1)
+    assert len(cache) == 1 and cache.evictions == 2
+    off = ExpressionCache(0)
+    off.get('1+1')
+    off.get('1+1')
+    assert len(off) == 0 and off.misses == 2 and off.hits == 0
@@ -0,0 +1,28 @@
+from fractions import Fraction
+
+import pytest
+
+from calculator_core import CalculatorCore
+from expression import format_result
+
+
+@pytest.mark.parametrize('value, expected', [
+    (Fraction(5), '5'), (Fraction(-3), '-3'), (Fraction(0), '0'),
+    (Fraction(1, 2), '0.5'), (Fraction(-3, 8), '-0.375'), (Fraction(1, 3), '1/3'),
+])
+def test_format_result(value, expected):
+    assert format_result(value) == expected
+
+
+def test_memory_round_trip():
+    core = CalculatorCore()
+    core.backend = 'fraction'
+    for _ in range(2):
+        core.clear()
+        for key in ('1', '/', '2', '=', 'M+'):
+            core.press(key)
+    assert core.memory == 1
+    core.clear()
+    core.press('MR')
+    core.press('=')
+    assert core.display == '1'
@@ -0,0 +1,50 @@
+from game_sessions import GameSessions
+
+
+def play(session, right, wrong=0):
+    for answer_right in [True] * right + [False] * wrong:
+        session.generate_question()
+        session.check_answer(str(session.answer if answer_right else session.answer + 1))
+
+
+def test_leaderboard_and_rank_with_ties():
+    sessions = GameSessions(seed=5)
+    carol, alice, bob, dave = (sessions.join(n) for n in ('carol', 'alice', 'bob', 'dave'))
+    play(carol, 2)   # 20
+    play(alice, 2)   # 20, ahead of carol by name
+    play(bob, 3)     # 30
+    assert sessions.leaderboard() == [('bob', 30), ('alice', 20), ('carol', 20), ('dave', 0)]
+    assert [sessions.rank(n) for n in ('bob', 'alice', 'carol', 'dave')] == [1, 2, 3, 4]
+    assert sessions.rank('nobody') is None
+
+    # Passing a tie moves the old entry rather than adding another
+    play(carol, 2)   # 40
+    assert sessions.leaderboard(2) == [('carol', 40), ('bob', 30)]
+    assert sessions.rank('alice') == 3 and len(sessions.leaderboard(100)) == 4
+
+    # The best score stays even when the current game goes badly
+    play(bob, 0, 3)
+    assert sessions.rank('bob') == 2 and bob.score < bob.best == 30
+    sessions.close()
+
+
+def test_scores_are_stored(tmp_path):
+    path = str(tmp_path / 'scores.sqlite3')
+    sessions = GameSessions(path, seed=5)
+    play(sessions.join('alice'), 1)
+    play(sessions.join('bob'), 1)
+    play(sessions.join('erin'), 2, 1)
+    sessions.close()
+
+    reopened = GameSessions(path)
+    assert reopened.leaderboard() == [('erin', 20), ('alice', 10), ('bob', 10)]
+    erin = reopened.join('erin')
+    assert (erin.best, erin.games, erin.answered, erin.correct) == (20, 1, 3, 2)
+    reopened.close()
+
+
+def test_players_share_the_question_sequence():
+    sessions = GameSessions(seed=9)
+    a, b = sessions.join('a'), sessions.join('b')
+    assert [a.generate_question() for _ in range(5)] == [b.generate_question() for _ in range(5)]
+    sessions.close()
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from guarded import GuardedEvaluator
+
+
+def wait(evaluator, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        outcome = evaluator.poll()
+        if outcome is not None:
+            return outcome
+        time.sleep(0.01)
+    raise AssertionError("no result")
+
+
+@pytest.fixture(scope='module')
+def evaluator():
+    evaluator = GuardedEvaluator(time_budget=20)
+    yield evaluator
+    evaluator.close()
+
+
+def test_result(evaluator):
+    evaluator.submit('2+3*4')
+    assert wait(evaluator) == (True, 14)
+    evaluator.submit('1/0')
+    assert wait(evaluator) == (False, "Cannot divide by zero")
+
+
+def test_last_seconds_is_the_workers_time(evaluator):
+    start = time.monotonic()
+    evaluator.submit('factorial(3000)')
+    assert wait(evaluator)[0]
+    assert 0 < evaluator.last_seconds <= time.monotonic() - start
+
+
+def test_cache_info_counts_the_workers_cache(evaluator):
+    before = evaluator.cache_info()
+    for _ in range(3):
+        evaluator.submit('7*6+1')
+        assert wait(evaluator) == (True, 43)
+    info = evaluator.cache_info()
+    assert info['misses'] == before['misses'] + 1
+    assert info['hits'] == before['hits'] + 2
+    assert info['size'] >= 1
+
+
+def test_cache_counters_survive_a_restart(evaluator):
+    evaluator.submit('5*5')
+    wait(evaluator)
+    before = evaluator.cache_info()
+    evaluator.close()
+    evaluator.submit('5*5')  # starts a new worker with an empty cache
+    wait(evaluator)
+    info = evaluator.cache_info()
+    assert info['misses'] == before['misses'] + 1
+    assert info['hits'] == before['hits']
+    assert info['size'] == 1
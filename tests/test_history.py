@@ -0,0 +1,48 @@
+from history import HistoryStore
+
+
+def fill(store, count, start=0):
+    for i in range(start, start + count):
+        store.append(f'{i}+{i}', str(2 * i), timestamp=float(i))
+
+
+def test_ring_buffer_keeps_the_newest():
+    store = HistoryStore(capacity=3)
+    fill(store, 5)
+    assert len(store) == 3
+    assert [e.expression for e in store] == ['2+2', '3+3', '4+4']
+    assert [e.expression for e in store.recent(2)] == ['3+3', '4+4']
+    assert [e.expression for e in store.recent(10)] == ['2+2', '3+3', '4+4']
+    # evicted entries are gone from the indexes too
+    assert store.search_prefix('0+') == [] and store.search_result('0') == []
+
+
+def test_prefix_search():
+    store = HistoryStore(capacity=10)
+    for expression in ('sin(30)', '12*7', 'sin(45)', 'sqrt(2)', '12+1', 'sin(30)'):
+        store.append(expression, '1')
+    assert [e.expression for e in store.search_prefix('sin(')] == ['sin(30)', 'sin(45)', 'sin(30)']
+    assert [e.expression for e in store.search_prefix('s')] == \
+        ['sin(30)', 'sin(45)', 'sqrt(2)', 'sin(30)']
+    assert [e.expression for e in store.search_prefix('12')] == ['12*7', '12+1']
+    assert len(store.search_prefix('sin(', limit=2)) == 2
+    assert store.search_prefix('cos') == []
+
+
+def test_prefix_search_after_wraparound():
+    store = HistoryStore(capacity=4)
+    fill(store, 12)
+    assert [e.expression for e in store.search_prefix('1')] == ['10+10', '11+11']
+    assert [e.result for e in store.search_result('16')] == ['16']
+
+
+def test_persists_only_the_tail(tmp_path):
+    path = str(tmp_path / 'history.txt')
+    store = HistoryStore(capacity=100, path=path)
+    fill(store, 50)
+    store.close()
+    reopened = HistoryStore(capacity=5, path=path)
+    assert [e.expression for e in reopened] == [f'{i}+{i}' for i in range(45, 50)]
+    reopened.append('a\tb', 'c\nd')
+    reopened.close()
+    assert HistoryStore(capacity=1, path=path).recent(1)[0].expression == 'a b'
@@ -0,0 +1,29 @@
+from instrumentation import Instrumentation
+
+
+class Target:
+    def calculate(self):
+        return 1
+
+
+def test_record_only_while_enabled():
+    metrics = Instrumentation()
+    metrics.record('evaluate', 0.5)
+    assert 'evaluate' not in metrics.histograms
+    metrics.enable(Target())
+    metrics.record('evaluate', 0.002)
+    metrics.record('evaluate', 0.004, error=True)
+    evaluate = metrics.snapshot()['evaluate']
+    assert evaluate['count'] == 2
+    assert evaluate['errors'] == 1
+    assert evaluate['max'] == 0.004
+    assert 'calculator_operation_seconds_count{op="evaluate"} 2' in metrics.to_prometheus()
+
+
+def test_wrapped_operations_are_timed():
+    metrics, target = Instrumentation(), Target()
+    metrics.enable(target)
+    assert target.calculate() == 1
+    assert metrics.snapshot()['calculate']['count'] == 1
+    metrics.disable()
+    assert 'calculate' not in vars(target)
@@ -0,0 +1,50 @@
+from fractions import Fraction
+
+import pytest
+
+from calculator_core import CalculationError
+from parallel import ParallelEvaluator, evaluate_serial, hot_expressions
+
+EXPRESSIONS = ['1+1', 'sin(30)', '1/0', '2**60+1', 'sqrt(2)', 'foo(', '-2**53',
+               '10/4', 'factorial(25)', '(1+2', '7%3'] * 9
+
+
+def plain(results):
+    # Errors compare by message
+    return [str(r) if isinstance(r, CalculationError) else r for r in results]
+
+
+@pytest.fixture(scope='module')
+def pool():
+    # Small chunks, so the batch is many chunks and more than the in-flight window
+    with ParallelEvaluator(jobs=2, chunk_size=3) as pool:
+        yield pool
+
+
+def test_matches_the_serial_loop(pool):
+    results = pool.evaluate(EXPRESSIONS)
+    assert plain(results) == plain(evaluate_serial(EXPRESSIONS))
+    assert results[3] == 2**60 + 1 and type(results[3]) is int
+    assert results[6] == -2**53
+    assert isinstance(results[2], CalculationError) and str(results[2]) == "Cannot divide by zero"
+
+
+def test_unordered_gives_every_index_once(pool):
+    pairs = list(pool.imap(EXPRESSIONS, ordered=False))
+    assert sorted(i for i, _ in pairs) == list(range(len(EXPRESSIONS)))
+    expected = plain(evaluate_serial(EXPRESSIONS))
+    assert all(plain([result])[0] == expected[i] for i, result in pairs)
+
+
+def test_empty_batch(pool):
+    assert pool.evaluate([]) == []
+
+
+def test_fraction_backend():
+    with ParallelEvaluator(jobs=1, backend='fraction') as pool:
+        assert pool.evaluate(['1/3+1/6', '2**70', '0.1*3']) == \
+            [Fraction(1, 2), 2**70, Fraction(3, 10)]
+
+
+def test_hot_expressions():
+    assert hot_expressions(['a', ' b', 'b ', 'c', 'a', 'b'], 5) == ['b', 'a']
@@ -0,0 +1,25 @@
+import pytest
+
+from calculator_core import CalculatorCore, split_input
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('√9\n', [('sqrt(9)', '3')]),
+    ('√(16)\n', [('sqrt((16))', '4')]),
+    ('2×3\n10÷4\n2^3\n', [('2*3', '6'), ('10/4', '2.5'), ('2**3', '8')]),
+    ('1+1\n\n1/0\n', [('1+1', '2'), ('1/0', 'Error: Cannot divide by zero')]),
+])
+def test_feed(text, expected):
+    assert CalculatorCore().feed(text) == expected
+
+
+def test_feed_keeps_the_tail_as_input():
+    core = CalculatorCore()
+    assert core.feed('1+2\n√4') == [('1+2', '3')]
+    assert core.expression == 'sqrt(4'
+    core.calculate()
+    assert core.display == '2'
+
+
+def test_split_input_drops_junk():
+    assert split_input('1 + 2 = ?\r\n$3×4\n') == ['1 + 2', '3*4', '']
@@ -0,0 +1,124 @@
+import math
+
+import pytest
+
+from plotting import Plot, PlotView, downsample
+
+
+class Canvas:
+    # Just enough of a Tk canvas: after() jobs run when run() is called
+    def __init__(self):
+        self.jobs = {}
+        self.items = []
+        self.next_job = 0
+
+    def bind(self, *args):
+        pass
+
+    def winfo_width(self):
+        return 200
+
+    def winfo_height(self):
+        return 100
+
+    def after(self, ms, fn, *args):
+        self.next_job += 1
+        self.jobs[self.next_job] = (fn, args)
+        return self.next_job
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def run(self):
+        while self.jobs:
+            job = min(self.jobs)
+            fn, args = self.jobs.pop(job)
+            fn(*args)
+
+    def delete(self, tag):
+        self.items = []
+
+    def create_line(self, *coords, fill=None, width=1):
+        self.items.append((fill, coords))
+
+    def create_text(self, *args, **kwargs):
+        pass
+
+    def curves(self):
+        return [coords for fill, coords in self.items if fill == 'curve']
+
+
+COLORS = {'grid': 'grid', 'axis': 'axis', 'text': 'text', 'curve': 'curve'}
+
+
+def make_view(budget):
+    canvas = Canvas()
+    made = []
+
+    def make_plot(lo, hi, points):
+        # A different curve, to tell new samples from old ones
+        made.append(Plot('x+50', lo, hi, initial=points))
+        return made[-1]
+
+    view = PlotView(canvas, lambda: COLORS, make_plot)
+    view.BUDGET = budget
+    view.show(Plot('x', 0, 10))
+    canvas.run()
+    return canvas, view, made
+
+
+@pytest.mark.parametrize('budget', [1e-4, 10.0])  # resample over many turns, or at once
+def test_pan_past_the_samples_draws_only_the_new_ones(budget):
+    canvas, view, made = make_view(budget)
+    assert canvas.curves()
+    view.view = (5, 15, 50, 70)
+    view.redraw()
+    if view.sampling is not None:
+        assert view.sampling is made[0] and not canvas.curves()
+    canvas.run()
+    assert view.plot is made[0] and view.sampling is None
+    # The old samples (y from 5 to 10) are far below this view, clamped
+    # to the bottom edge at 200
+    ys = [py for line in canvas.curves() for py in line[1::2]]
+    assert ys and max(ys) < 200
+
+
+def test_downsample_keeps_each_columns_extremes():
+    # 10000 samples of a fast wiggle across 50 pixel columns
+    xs = [i / 1000 for i in range(10000)]
+    ys = [math.sin(x * 37) * (1 + x) for x in xs]
+    view, width, height = (0, 10, -12, 12), 50, 100
+    lines = downsample(xs, ys, view, width, height)
+    assert len(lines) == 1
+    points = list(zip(lines[0][::2], lines[0][1::2]))
+    assert len(points) <= 4 * width
+    columns = {}
+    for x, y in zip(xs, ys):
+        columns.setdefault(int(x * (width / 10)), []).append((12 - y) * height / 24)
+    drawn = {}
+    for px, py in points:
+        drawn.setdefault(int(px), []).append(py)
+    assert sorted(drawn) == sorted(columns)
+    for column, pys in columns.items():
+        assert min(drawn[column]) == pytest.approx(min(pys))
+        assert max(drawn[column]) == pytest.approx(max(pys))
+        assert drawn[column][0] == pytest.approx(pys[0])
+        assert drawn[column][-1] == pytest.approx(pys[-1])
+
+
+def test_downsample_breaks_the_line_where_undefined():
+    xs = list(range(10))
+    ys = [0, 1, 2, math.nan, 4, 5, math.inf, 7, 8, 9]
+    lines = downsample(xs, ys, (0, 10, 0, 10), 10, 10)
+    assert [len(line) // 2 for line in lines] == [3, 2, 3]
+
+
+def test_plot_refines_where_the_curve_bends():
+    # Every interval of the grid gets one midpoint; only bent ones get more
+    flat = Plot('2*x+1', -1, 1, initial=9).run()
+    assert len(flat) == 17
+    plot = Plot('abs(x-0.1)', -1, 1, initial=9).run()
+    xs = plot.xs
+    assert xs == sorted(xs) and xs[0] == -1 and xs[-1] == 1
+    extra = set(xs) - set(flat.xs)
+    assert extra and all(abs(x - 0.1) < 0.125 for x in extra)
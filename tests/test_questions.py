@@ -0,0 +1,60 @@
+from fractions import Fraction
+
+import pytest
+
+from questions import OPERATORS, Game, QuestionPool, parse_answer
+
+
+def check(question, answer):
+    a, op, b = question.split()
+    a, b = int(a), int(b)
+    expected = {'+': a + b, '-': a - b, '×': a * b, '÷': Fraction(a, b)}[op]
+    return expected == answer and op in OPERATORS
+
+
+def test_same_seed_same_questions():
+    pools = [QuestionPool(42, 'hard', batch_size=16, background=False),
+             QuestionPool(42, 'hard', batch_size=16, background=True)]
+    try:
+        sequences = [[pool.next() for _ in range(40)] for pool in pools]
+    finally:
+        for pool in pools:
+            pool.close()
+    assert sequences[0] == sequences[1]
+    assert all(check(*q) for q in sequences[0])
+    other = QuestionPool(43, 'hard', batch_size=16, background=False)
+    assert [other.next() for _ in range(40)] != sequences[0]
+
+
+def test_take_and_next_share_one_sequence():
+    pool = QuestionPool(7, batch_size=8, background=False)
+    expected = pool.take(30)
+    replay = pool.replay()
+    assert replay.seed == 7 and replay.tier == 'normal'
+    got = [replay.next()] + replay.take(20) + [replay.next() for _ in range(9)]
+    assert got == expected
+
+
+def test_game_replays_a_seed():
+    game = Game('easy')
+    game.background = False
+    seed = game.new_game(seed=1234)
+    first = [game.generate_question() for _ in range(10)]
+    game.new_game(seed=seed)
+    assert [game.generate_question() for _ in range(10)] == first
+
+
+def test_unknown_tier():
+    with pytest.raises(ValueError):
+        QuestionPool(1, 'impossible', background=False)
+
+
+@pytest.mark.parametrize('text, value', [('42', 42), ('42.0', 42), ('84/2', 42), (' 7 ', 7)])
+def test_parse_answer(text, value):
+    assert parse_answer(text) == value
+
+
+@pytest.mark.parametrize('text', ['', 'x', '1/0'])
+def test_parse_answer_rejects(text):
+    with pytest.raises(ValueError):
+        parse_answer(text)
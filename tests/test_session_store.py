@@ -0,0 +1,96 @@
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+from calculator_core import CalculationError, CalculatorCore
+from session_store import MAGIC, SET, SessionStore, _varint, decode_records, encode_record
+
+STATE = {'expression': '12*7', 'memory.M': Fraction(2, 3), 'memory.tax': Decimal('0.07'),
+         'is_degree': True, 'precision': 28, 'x': 1.5, 'none': None}
+
+
+def raw_record(key, kind, payload):
+    key = key.encode()
+    return bytes((SET,)) + _varint(len(key)) + key + kind + _varint(len(payload)) + payload
+
+
+def log(state):
+    return MAGIC + b''.join(encode_record(k, v) for k, v in state.items())
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'session.bin')
+    store = SessionStore(path)
+    store.load()
+    store.replace(STATE)
+    store.delete('none')
+    store.close()
+    expected = dict(STATE)
+    del expected['none']
+    assert SessionStore(path).load() == expected
+
+
+@pytest.mark.parametrize('record', [
+    raw_record('bad', b'q', b'1/0'),                # ZeroDivisionError
+    raw_record('bad', b'f', b'\x00\x01'),           # struct.error
+    raw_record('bad', b'd', b'not a number'),       # decimal.InvalidOperation
+    raw_record('bad', b'i', b'12x'),                # ValueError
+    raw_record('bad', b's', b'\xff\xfe'),           # UnicodeDecodeError
+    raw_record('bad', b'?', b''),                   # unknown type
+    bytes((7,)) + b'junk',                          # unknown op
+])
+def test_corrupt_tail_is_dropped(record):
+    good = log(STATE)
+    state, valid = decode_records(good + record + encode_record('later', 1))
+    assert state == STATE
+    assert valid == len(good)
+
+
+def test_torn_tail_is_dropped():
+    good = log(STATE)
+    record = encode_record('torn', 'some text')
+    for cut in range(1, len(record)):
+        state, valid = decode_records(good + record[:cut])
+        assert state == STATE
+        assert valid == len(good)
+
+
+def test_load_recovers_and_rewrites(tmp_path):
+    path = tmp_path / 'session.bin'
+    path.write_bytes(log(STATE) + raw_record('bad', b'q', b'1/0'))
+    store = SessionStore(str(path))
+    assert store.load() == STATE
+    store.set('expression', '1+1')
+    store.close()
+    # The damaged file was replaced by a snapshot, so nothing after it is lost
+    assert SessionStore(str(path)).load() == dict(STATE, expression='1+1')
+
+
+def test_not_a_session_file(tmp_path):
+    path = tmp_path / 'session.bin'
+    path.write_bytes(b'something else')
+    assert SessionStore(str(path)).load() == {}
+
+
+def test_complex_results_stay_out_of_memory(tmp_path):
+    core = CalculatorCore()
+    core.expression = '(-8)**0.5'
+    core.calculate()
+    with pytest.raises(CalculationError, match="complex"):
+        core.press('M+')
+    core.press('C')
+    core.press('2')
+    core.press('=')
+    core.press('M+')
+    store = SessionStore(str(tmp_path / 'session.bin'))
+    store.replace(core.snapshot())
+    store.close()
+    assert SessionStore(str(tmp_path / 'session.bin')).load()['memory.M'] == 2
+
+
+def test_whole_fraction_totals_are_stored_as_int():
+    core = CalculatorCore()
+    core.add_to_memory(Fraction(1, 2))
+    core.add_to_memory(Fraction(1, 2))
+    assert type(core.memory) is int and core.memory == 1
@@ -0,0 +1,93 @@
+import math
+
+import pytest
+
+from calculator_core import CalculationError, CalculatorCore
+
+
+@pytest.fixture
+def core():
+    core = CalculatorCore()
+    core.is_degree = False
+    return core
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('(-x)*(-y)', 'x*y'),
+    ('(-x)*(-x)', 'x**2'),
+    ('(-x)/(-y)', 'x/y'),
+    ('(-x)*y', '-(x*y)'),
+    ('x*(-y)', '-(x*y)'),
+    ('-(-x)', 'x'),
+])
+def test_signs(core, text, expected):
+    assert core.simplify(text) == expected
+
+
+@pytest.mark.parametrize('text, values, expected', [
+    ('(-x)*(-y)', {'x': 2, 'y': 3}, 6),
+    ('(-x)*(-x)', {'x': 3}, 9),
+    ('(-x)*y', {'x': 2, 'y': 3}, -6),
+    ('(-x)/(-y)', {'x': 6, 'y': 3}, 2),
+])
+def test_sign_values(core, text, values, expected):
+    assert core.evaluate_symbolic(text, values) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('x+0', 'x'),
+    ('0*x+1*y', 'y'),
+    ('x-x', '0'),
+    ('x/x', '1'),
+    ('x*x*x', 'x**3'),
+    ('x**1', 'x'),
+    ('x**0', '1'),
+    ('2*(3*x)', '6*x'),
+    ('x*(1/y)', 'x/y'),
+    ('2+3*4', '14'),
+    ('1/3+1/6', '0.5'),
+])
+def test_simplify(core, text, expected):
+    assert core.simplify(text) == expected
+
+
+def test_constants_fold_exactly(core):
+    assert core.simplify('1/3+1/3') == '2/3'
+    assert core.simplify('x*(1/3+1/3)') == '2/3*x'
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('x**3', '3*x**2'),
+    ('sin(x)', 'cos(x)'),
+    ('x*sin(x)', 'sin(x) + x*cos(x)'),
+    ('1/x', '-1/x**2'),
+    ('log(x)', '1/x'),
+    ('(-x)*(-x)', '2*x'),
+    ('y', '0'),
+    ('5', '0'),
+])
+def test_derivative(core, text, expected):
+    assert core.differentiate(text) == expected
+
+
+@pytest.mark.parametrize('text', ['x**3', 'x*sin(x)', '1/x', 'sqrt(x)', 'cos(2*x)', '(-x)*(-x)'])
+def test_derivative_matches_difference_quotient(core, text):
+    # Values come back rounded to the display's digits, hence the wide step
+    h, x = 1e-3, 0.7
+    slope = (core.evaluate_symbolic(text, {'x': x + h}) -
+             core.evaluate_symbolic(text, {'x': x - h})) / (2 * h)
+    derivative = core.differentiate(text)
+    assert core.evaluate_symbolic(derivative, {'x': x}) == pytest.approx(slope, rel=1e-4)
+
+
+def test_derivative_in_degrees(core):
+    core.is_degree = True
+    value = core.evaluate_symbolic(core.differentiate('sin(x)'), {'x': 0})
+    assert value == pytest.approx(math.pi / 180)
+
+
+def test_errors(core):
+    with pytest.raises(CalculationError):
+        core.simplify('x/0')
+    with pytest.raises(CalculationError):
+        core.simplify('x+')
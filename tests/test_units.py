@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from units import default_registry
+
+
+def registry_with(tmp_path, content):
+    path = tmp_path / 'units.json'
+    path.write_text(content if isinstance(content, str) else json.dumps(content), encoding='utf-8')
+    return default_registry(str(path))
+
+
+def test_user_units(tmp_path):
+    registry = registry_with(tmp_path, {'length': {'furlong': 201.168},
+                                        'temperature': {'reaumur': [1.25, 273.15]}})
+    assert registry.convert(1, 'furlong', 'meter', 'length') == pytest.approx(201.168)
+    assert registry.convert(80, 'reaumur', 'celsius', 'temperature') == pytest.approx(100)
+    assert registry.problems == []
+
+
+def test_missing_file_is_fine(tmp_path):
+    registry = default_registry(str(tmp_path / 'nothing.json'))
+    assert registry.problems == []
+    assert 'mile' in registry.units('length')
+
+
+@pytest.mark.parametrize('content', ['{not json', '[1, 2]', '"text"'])
+def test_unusable_file_keeps_the_built_in_units(tmp_path, content):
+    registry = registry_with(tmp_path, content)
+    assert len(registry.problems) == 1
+    assert registry.convert(1, 'kilometer', 'meter', 'length') == 1000
+
+
+def test_bad_entries_are_skipped(tmp_path):
+    registry = registry_with(tmp_path, {
+        'length': {'furlong': 201.168, 'zero': 0, 'many': [1, 2, 3], 'text': 'abc',
+                   'none': None},
+        'volume': {'litre': 1, 'bad': []},
+        'oops': 5,
+    })
+    assert len(registry.problems) == 6
+    assert registry.units('length')[-1] == 'furlong'
+    assert registry.units('volume') == ['litre']
+    assert registry.convert(1, 'mile', 'foot', 'length') == pytest.approx(5280)
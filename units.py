@@ -0,0 +1,209 @@
+import csv
+import json
+from itertools import islice
+from fractions import Fraction
+
+# Unit conversion tables. Every unit is stored as (scale, offset) against its
+# dimension's base unit: base = value * scale + offset. For each dimension an
+# N x N table of (factor, offset) pairs is precomputed, so converting between
+# any two units is a single multiply-add. The tables are computed with exact
+# fractions and rounded once, so e.g. celsius -> fahrenheit is exactly *1.8 + 32.
+
+DECIMAL_PREFIXES = [('kilo', 10 ** 3), ('mega', 10 ** 6), ('giga', 10 ** 9),
+                    ('tera', 10 ** 12), ('peta', 10 ** 15)]
+BINARY_PREFIXES = [('kibi', 2 ** 10), ('mebi', 2 ** 20), ('gibi', 2 ** 30),
+                   ('tebi', 2 ** 40), ('pebi', 2 ** 50)]
+
+DEFAULT_UNITS = {
+    'length': [  # base: meter
+        ('meter', 1.0), ('kilometer', 1000.0), ('mile', 1609.344), ('foot', 0.3048),
+        ('centimeter', 0.01), ('millimeter', 0.001), ('yard', 0.9144),
+        ('inch', 0.0254), ('nautical mile', 1852.0),
+    ],
+    'weight': [  # base: kilogram
+        ('kilogram', 1.0), ('gram', 0.001), ('pound', 0.45359237), ('ounce', 0.028349523125),
+        ('milligram', 1e-6), ('tonne', 1000.0), ('stone', 6.35029318),
+    ],
+    'temperature': [  # base: kelvin
+        ('celsius', 1, Fraction('273.15')),
+        ('fahrenheit', Fraction(5, 9), Fraction('273.15') - Fraction(160, 9)),
+        ('kelvin', 1, 0), ('rankine', Fraction(5, 9), 0),
+    ],
+    'data': [  # base: byte
+        ('byte', 1.0), ('bit', 0.125),
+    ] + [(prefix + 'byte', size) for prefix, size in DECIMAL_PREFIXES]
+      + [(prefix + 'byte', size) for prefix, size in BINARY_PREFIXES]
+      + [(prefix + 'bit', Fraction(size, 8)) for prefix, size in DECIMAL_PREFIXES],
+}
+
+
+_np = False
+
+
+def _numpy():
+    # NumPy is optional and only imported the first time a bulk path needs it
+    global _np
+    if _np is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _np = numpy
+    return _np
+
+
+def _exact(number):
+    # 0.3048 means the decimal 0.3048, not the nearest binary float
+    if isinstance(number, float):
+        return Fraction(repr(number))
+    return Fraction(number)
+
+
+class UnitRegistry:
+    def __init__(self):
+        self.dimensions = {}  # dimension -> {unit: (scale, offset)}
+        self._tables = {}     # dimension -> (index, factors, offsets)
+        self.problems = []    # what load() had to skip, as messages
+
+    def add_unit(self, dimension, name, scale, offset=0):
+        scale, offset = _exact(scale), _exact(offset)
+        if scale == 0:
+            raise ValueError(f"Unit {name!r} needs a non-zero scale")
+        self.dimensions.setdefault(dimension, {})[name] = (scale, offset)
+        self._tables.pop(dimension, None)
+
+    def units(self, dimension):
+        return list(self.dimensions.get(dimension, ()))
+
+    def table(self, dimension):
+        table = self._tables.get(dimension)
+        if table is None:
+            units = self.dimensions.get(dimension)
+            if not units:
+                raise ValueError(f"Unknown dimension {dimension!r}")
+            index = {name: i for i, name in enumerate(units)}
+            pairs = list(units.values())
+            factors = [[float(s_from / s_to) for s_to, o_to in pairs] for s_from, o_from in pairs]
+            offsets = [[float((o_from - o_to) / s_to) for s_to, o_to in pairs]
+                       for s_from, o_from in pairs]
+            table = self._tables[dimension] = (index, factors, offsets)
+        return table
+
+    def converter(self, from_u, to_u, dimension):
+        # (factor, offset) so that converted = value * factor + offset
+        index, factors, offsets = self.table(dimension)
+        try:
+            i, j = index[from_u], index[to_u]
+        except KeyError as e:
+            raise ValueError(f"Unknown {dimension} unit {e.args[0]!r}")
+        return factors[i][j], offsets[i][j]
+
+    def convert(self, value, from_u, to_u, dimension):
+        factor, offset = self.converter(from_u, to_u, dimension)
+        return value * factor + offset
+
+    def convert_many(self, values, from_u, to_u, dimension):
+        # Same factor/offset and the same two float operations as convert(), so
+        # every element matches the single-value path bit for bit
+        factor, offset = self.converter(from_u, to_u, dimension)
+        np = _numpy()
+        if np is not None and isinstance(values, np.ndarray):
+            return values.astype(np.float64) * factor + offset
+        return [value * factor + offset for value in values]
+
+    def convert_csv(self, src, dst, column, from_u, to_u, dimension,
+                    replace=False, chunk_size=50000):
+        # Stream a CSV file converting one column chunk by chunk, so memory stays
+        # flat on large files. `column` is a header name or, for files without a
+        # header row, a 0-based index. The converted value is appended as a new
+        # column unless replace=True. Cells that are not numbers come out empty.
+        # Returns the number of data rows written.
+        factor, offset = self.converter(from_u, to_u, dimension)
+        np = _numpy()
+        count = 0
+        with open(src, newline='', encoding='utf-8') as fin, \
+                open(dst, 'w', newline='', encoding='utf-8') as fout:
+            reader = csv.reader(fin)
+            writer = csv.writer(fout)
+            if isinstance(column, int):
+                col = column
+            else:
+                header = next(reader, None)
+                if header is None:
+                    return 0
+                col = header.index(column)
+                writer.writerow(header if replace else header + [f"{column} ({to_u})"])
+
+            while True:
+                chunk = list(islice(reader, chunk_size))
+                if not chunk:
+                    return count
+                values = []
+                for row in chunk:
+                    try:
+                        values.append(float(row[col]))
+                    except (ValueError, IndexError):
+                        values.append(None)
+                if np is not None:
+                    arr = np.array([v if v is not None else np.nan for v in values],
+                                   dtype=np.float64)
+                    converted = (arr * factor + offset).tolist()
+                else:
+                    converted = [v * factor + offset if v is not None else None for v in values]
+                for row, value, result in zip(chunk, values, converted):
+                    cell = repr(result) if value is not None else ''
+                    if replace and col < len(row):
+                        row[col] = cell
+                    else:
+                        row.append(cell)
+                writer.writerows(chunk)
+                count += len(chunk)
+
+    def load(self, path):
+        # User units as JSON: {"length": {"furlong": 201.168},
+        #                      "temperature": {"reaumur": [1.25, 273.15]}}
+        # A file or entry that can't be used is skipped and described in
+        # self.problems; everything else, and the built-in units, still load.
+        # Returns the number of units added.
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise
+        except (OSError, ValueError) as e:  # ValueError: bad JSON or encoding
+            self.problems.append(f"{path}: {e}")
+            return 0
+        if not isinstance(data, dict):
+            self.problems.append(f"{path}: expected an object of dimensions")
+            return 0
+        added = 0
+        for dimension, units in data.items():
+            if not isinstance(units, dict):
+                self.problems.append(f"{dimension}: expected an object of units")
+                continue
+            for name, spec in units.items():
+                try:
+                    if isinstance(spec, (list, tuple)):
+                        if not 1 <= len(spec) <= 2:
+                            raise ValueError("expected a scale or [scale, offset]")
+                        self.add_unit(dimension, name, *spec)
+                    else:
+                        self.add_unit(dimension, name, spec)
+                except (TypeError, ValueError, ArithmeticError) as e:
+                    self.problems.append(f"{dimension} {name!r}: {e}")
+                else:
+                    added += 1
+        return added
+
+
+def default_registry(path=None):
+    registry = UnitRegistry()
+    for dimension, units in DEFAULT_UNITS.items():
+        for unit in units:
+            registry.add_unit(dimension, *unit)
+    if path is not None:
+        try:
+            registry.load(path)
+        except FileNotFoundError:
+            pass
+    return registry